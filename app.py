@@ -1,14 +1,39 @@
+import os
+from typing import TYPE_CHECKING
+
 import streamlit as st
 
-from pages.draft import DraftPage
-from pages.matchup import MatchupPage
+from metrics import span
+from page_registry import PAGES, load_page
+from pages.page import Page
+
+if TYPE_CHECKING:
+    from warmup import Refresher
+
+# set to 1 to have each server process run the warm-up and refresh worker
+REFRESH_IN_APP = os.environ.get("ESPN_REFRESH_IN_APP", "0") == "1"
+
+
+@st.cache_resource
+def start_refresher() -> "Refresher":
+    """One background warm-up and refresh thread per server process"""
+    from helpers import ESPN, WAREHOUSE
+    from warmup import Refresher
+
+    refresher = Refresher(ESPN, WAREHOUSE, Page().seasons)
+    refresher.start()
+    return refresher
 
-PAGES = {
-    "Draft": DraftPage,
-    "Matchups": MatchupPage,
-}
 
 st.set_page_config(layout="wide")
+if REFRESH_IN_APP:
+    start_refresher()
 st.sidebar.title("Navigation")
 page = st.sidebar.radio("Pages", list(PAGES.keys()))
-PAGES[page]().run()
+view = load_page(page)()
+with span("page.run", page=page):
+    view.run()
+if st.sidebar.checkbox("Show diagnostics"):
+    from helpers import diagnostics_panel
+
+    diagnostics_panel(view)
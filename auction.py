@@ -0,0 +1,276 @@
+import argparse
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import polars as pl
+
+from enumerations import POSITIONS
+
+RANKS_PATH = "espn_auction_ranks.csv"
+BUDGET = 200
+SLOTS = {"QB": 1, "RB": 2, "WR": 2, "TE": 1, "FLEX": 1, "K": 1, "D/ST": 1}
+FLEX_POSITIONS = ("RB", "WR", "TE")
+# bench spots each cost at least $1, so that much is held back from starters
+BENCH = 7
+# value columns tried in order; csvs from before main.py exported projections
+# only have ownership, a rough proxy for value
+VALUE_COLUMNS = ("projected_points", "percent_owned")
+
+
+def value_column(columns: List[str]) -> str:
+    """The first of VALUE_COLUMNS among a ranks csv's columns"""
+    return next((name for name in VALUE_COLUMNS if name in columns), VALUE_COLUMNS[0])
+
+
+def load_ranks(path: str = RANKS_PATH, value: Optional[str] = None) -> pl.DataFrame:
+    """
+    Players from main.py's csv with a position name, integer cost and value,
+    by default the first of VALUE_COLUMNS the csv has
+    """
+    ranks = pl.read_csv(path)
+    value = value or value_column(ranks.columns)
+    if value not in ranks.columns:
+        raise ValueError(f"{path} has no {value} column; rerun main.py or pick another")
+    return ranks.filter(pl.col("position").is_in(list(POSITIONS))).select(
+        "player_id",
+        "player_name",
+        pl.col("position").replace_strict(POSITIONS, return_dtype=pl.Utf8),
+        # ESPN values undrafted players near $0 but every bid costs at least $1
+        pl.col("average_auction_value").round().cast(pl.Int32).clip(1).alias("cost"),
+        pl.col(value).fill_null(0.0).cast(pl.Float64).alias("value"),
+    )
+
+
+def _knapsack(
+    costs: np.ndarray, values: np.ndarray, max_count: int, budget: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    best[k, c]: most value from exactly k of the players costing at most c in
+    total (-inf if impossible), and took[i, k, c] for tracing the choice back
+    """
+    best = np.full((max_count + 1, budget + 1), -np.inf)
+    best[0] = 0.0
+    took = np.zeros((len(costs), max_count + 1, budget + 1), dtype=bool)
+    for i, (cost, value) in enumerate(zip(costs, values)):
+        if cost > budget:
+            continue
+        candidate = np.full_like(best, -np.inf)
+        candidate[1:, cost:] = best[:-1, : budget + 1 - cost] + value
+        took[i] = candidate > best
+        best = np.where(took[i], candidate, best)
+    return best, took
+
+
+def _max_plus(a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    out[c] = max over x of a[x] + b[c - x], and the maximizing x. Both are
+    non-decreasing in c, so only the x where a steps up can be maximal.
+    """
+    out = np.full_like(a, -np.inf)
+    split = np.zeros(len(a), dtype=np.int32)
+    with np.errstate(invalid="ignore"):
+        steps = np.flatnonzero(np.diff(a, prepend=-np.inf) > 0)
+    for x in steps:
+        candidate = a[x] + b[: len(a) - x]
+        better = candidate > out[x:]
+        out[x:][better] = candidate[better]
+        split[x:][better] = x
+    return out, split
+
+
+@dataclass
+class _PositionTable:
+    player_ids: np.ndarray
+    costs: np.ndarray
+    best: np.ndarray
+    took: np.ndarray
+
+    def players(self, count: int, budget: int) -> List[int]:
+        chosen = []
+        for i in range(len(self.costs) - 1, -1, -1):
+            if count and self.took[i, count, budget]:
+                chosen.append(int(self.player_ids[i]))
+                count -= 1
+                budget -= int(self.costs[i])
+        return chosen
+
+
+@dataclass
+class Solution:
+    value: float
+    cost: int
+    player_ids: List[int] = field(default_factory=list)
+
+
+class AuctionOptimizer:
+    """
+    Best starting lineup for the remaining budget and open slots. Each
+    position keeps a knapsack table over (players taken, dollars), so a
+    player leaving the pool only rebuilds that position's table and every
+    re-solve is a few max-plus convolutions over the dollar axis.
+    """
+
+    def __init__(
+        self,
+        players: pl.DataFrame,
+        budget: int = BUDGET,
+        slots: Dict[str, int] = SLOTS,
+        bench: int = BENCH,
+    ):
+        self.players = players
+        self.budget = budget
+        self.max_budget = budget
+        self.open_slots = dict(slots)
+        self.bench = bench
+        self.roster: List[int] = []
+        self.available = set(players["player_id"].to_list())
+        self._tables: Dict[str, _PositionTable] = {}
+        self._position = dict(zip(players["player_id"], players["position"]))
+        self._price = dict(zip(players["player_id"], players["cost"]))
+
+    def _max_count(self, position: str) -> int:
+        flex = self.open_slots.get("FLEX", 0) if position in FLEX_POSITIONS else 0
+        return self.open_slots.get(position, 0) + flex
+
+    def _table(self, position: str) -> _PositionTable:
+        table = self._tables.get(position)
+        max_count = self._max_count(position)
+        if table is None or table.best.shape[0] < max_count + 1:
+            pool = self.players.filter(
+                (pl.col("position") == position)
+                & pl.col("player_id").is_in(list(self.available))
+            ).pipe(_undominated, max_count)
+            costs = pool["cost"].to_numpy()
+            best, took = _knapsack(
+                costs, pool["value"].to_numpy(), max_count, self.max_budget
+            )
+            table = _PositionTable(pool["player_id"].to_numpy(), costs, best, took)
+            self._tables[position] = table
+        return table
+
+    def take(self, player_id: int) -> None:
+        """Another team bought the player"""
+        self.available.discard(player_id)
+        self._tables.pop(self._position.get(player_id), None)
+
+    def draft(self, player_id: int, price: Optional[int] = None) -> None:
+        """We bought the player, filling its position's slot, then FLEX, then the bench"""
+        self.take(player_id)
+        self.roster.append(player_id)
+        self.budget -= self._price[player_id] if price is None else price
+        position = self._position[player_id]
+        if self.open_slots.get(position, 0):
+            self.open_slots[position] -= 1
+        elif position in FLEX_POSITIONS and self.open_slots.get("FLEX", 0):
+            self.open_slots["FLEX"] -= 1
+        elif self.bench:
+            self.bench -= 1
+
+    def solve(self) -> Solution:
+        """Highest value set of players filling every open starting slot"""
+        budget = self.budget - self.bench
+        if budget < 0:
+            return Solution(-np.inf, 0)
+        fixed = {
+            position: count
+            for position, count in self.open_slots.items()
+            if position != "FLEX"
+        }
+        flex_options = (
+            [{**fixed, position: fixed.get(position, 0) + 1} for position in FLEX_POSITIONS]
+            if self.open_slots.get("FLEX", 0)
+            else [fixed]
+        )
+        best = Solution(-np.inf, 0)
+        for counts in flex_options:
+            tables = [(self._table(p), k) for p, k in counts.items() if k]
+            if not tables:
+                return Solution(0.0, 0)
+            total = tables[0][0].best[tables[0][1], : budget + 1]
+            splits = []
+            for table, count in tables[1:]:
+                total, split = _max_plus(total, table.best[count, : budget + 1])
+                splits.append(split)
+            if total[budget] <= best.value:
+                continue
+            # walk the convolutions back to each position's share of the budget
+            chosen, remaining = [], budget
+            for (table, count), split in zip(tables[:0:-1], reversed(splits)):
+                before = int(split[remaining])
+                chosen += table.players(count, remaining - before)
+                remaining = before
+            chosen += tables[0][0].players(tables[0][1], remaining)
+            cost = sum(self._price[player_id] for player_id in chosen)
+            best = Solution(float(total[budget]), cost, chosen)
+        return best
+
+
+def _undominated(pool: pl.DataFrame, max_count: int) -> pl.DataFrame:
+    """Drop players that max_count others beat on both cost and value"""
+    costs, values = pool["cost"].to_numpy(), pool["value"].to_numpy()
+    dominated_by = (
+        (costs[None, :] <= costs[:, None])
+        & (values[None, :] >= values[:, None])
+        & ((costs[None, :] < costs[:, None]) | (values[None, :] > values[:, None]))
+    ).sum(axis=1)
+    return pool.filter(pl.Series(dominated_by < max_count))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Optimal auction roster from espn_auction_ranks.csv. Reads "
+        "'take <player_id>' and 'draft <player_id> [price]' lines from stdin "
+        "during a live auction and re-solves after each."
+    )
+    parser.add_argument("--ranks", default=RANKS_PATH)
+    parser.add_argument(
+        "--value",
+        help="csv column to maximise, by default the first of "
+        f"{', '.join(VALUE_COLUMNS)} the csv has",
+    )
+    parser.add_argument("--budget", type=int, default=BUDGET)
+    parser.add_argument("--bench", type=int, default=BENCH)
+    parser.add_argument("--live", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        players = load_ranks(args.ranks, value=args.value)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    value = args.value or value_column(pl.read_csv(args.ranks, n_rows=0).columns)
+    names = dict(zip(players["player_id"], players["player_name"]))
+    optimizer = AuctionOptimizer(players, budget=args.budget, bench=args.bench)
+
+    def report():
+        start = time.perf_counter()
+        solution = optimizer.solve()
+        elapsed = (time.perf_counter() - start) * 1000
+        print(
+            f"{value} {solution.value:.1f}, ${solution.cost} of "
+            f"${optimizer.budget - optimizer.bench} ({elapsed:.1f} ms)"
+        )
+        for player_id in solution.player_ids:
+            print(
+                f"  {optimizer._position[player_id]:<5}{names[player_id]:<28}"
+                f"${optimizer._price[player_id]}"
+            )
+
+    report()
+    if not args.live:
+        return
+    for line in iter(input, "done"):
+        command, *rest = line.split()
+        if command == "take":
+            optimizer.take(int(rest[0]))
+        elif command == "draft":
+            optimizer.draft(int(rest[0]), int(rest[1]) if len(rest) > 1 else None)
+        else:
+            print("expected 'take <player_id>', 'draft <player_id> [price]' or 'done'")
+            continue
+        report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+import argparse
+import gc
+import gzip
+import json
+import logging
+import random
+import time
+import tracemalloc
+import warnings
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+import polars as pl
+import streamlit as st
+
+from espn_api import FILTERS
+from luck import season_luck
+from matchups import build_facts, head_to_head
+from pages.draft import (
+    DraftPage,
+    build_filter_index,
+    fit_value_line,
+    get_unique_vals,
+    value_scatter_base,
+)
+from pages.matchup import MatchupPage
+from transport import RECORDINGS_DIR, Recordings, recording_key
+from warehouse import TABLES, decode_table, views_for
+
+BASELINE_PATH = Path("benchmark_baseline.json")
+# recordings made with ESPN_TRANSPORT=record python ingest.py
+INGEST_VIEWS = views_for(TABLES)
+
+Stage = Tuple[str, Callable[[], object]]
+
+
+def synthetic_season(
+    season: int, n_teams: int = 32, n_players: int = 20_000, n_weeks: int = 17
+) -> bytes:
+    """A leagueHistory payload shaped like ESPN's, scaled up to any league size"""
+    rnd = random.Random(season)
+    players = []
+    for player_id in range(n_players):
+        stats = [
+            {
+                "id": f"{source}{split}{season}{period or ''}",
+                "seasonId": season,
+                "scoringPeriodId": period,
+                "statSourceId": source,
+                "statSplitTypeId": split,
+                "appliedTotal": rnd.random() * (300 if split == 0 else 25),
+                "appliedAverage": rnd.random() * 25,
+                "stats": {str(stat): rnd.random() * 10 for stat in (0, 3, 24, 42, 53)},
+            }
+            for source in (0, 1)
+            for split, periods in ((0, [0]), (1, range(1, n_weeks + 1)))
+            for period in periods
+        ]
+        players.append(
+            {
+                "id": player_id,
+                "player": {
+                    "id": player_id,
+                    "fullName": f"Player {player_id}",
+                    "defaultPositionId": rnd.choice([1, 2, 3, 4, 5, 16]),
+                    "proTeamId": rnd.randint(0, 34),
+                    "injured": False,
+                    "stats": stats,
+                },
+            }
+        )
+    members = [
+        {"id": f"{{MEMBER-{i}}}", "displayName": f"member{i}", "firstName": f"F{i}"}
+        for i in range(n_teams)
+    ]
+    teams = [
+        {
+            "id": i + 1,
+            "location": f"Team {i}",
+            "nickname": "Nick",
+            "primaryOwner": members[i]["id"],
+        }
+        for i in range(n_teams)
+    ]
+    picks = [
+        {
+            "playerId": rnd.randrange(n_players),
+            "teamId": rnd.randint(1, n_teams),
+            "bidAmount": rnd.randint(1, 70),
+            "keeper": rnd.random() < 0.05,
+        }
+        for _ in range(n_teams * 16)
+    ]
+    schedule = []
+    for week in range(1, n_weeks + 1):
+        order = list(range(1, n_teams + 1))
+        rnd.shuffle(order)
+        for home, away in zip(order[::2], order[1::2]):
+            home_points, away_points = rnd.gauss(110, 25), rnd.gauss(110, 25)
+            schedule.append(
+                {
+                    "matchupPeriodId": week,
+                    "winner": "HOME" if home_points > away_points else "AWAY",
+                    "home": {"teamId": home, "totalPoints": home_points},
+                    "away": {"teamId": away, "totalPoints": away_points},
+                }
+            )
+    jsn = {
+        "id": 0,
+        "seasonId": season,
+        "players": players,
+        "members": members,
+        "teams": teams,
+        "draftDetail": {"picks": picks},
+        "schedule": schedule,
+    }
+    return json.dumps([jsn]).encode()
+
+
+def recorded_seasons(recordings: Recordings) -> Dict[int, bytes]:
+    """Raw payloads of every season recorded with all the views the pages use"""
+    payloads = {}
+    for season in range(2000, 2100):
+        params = {"view": INGEST_VIEWS, "seasonId": season}
+        data = recordings.load(recording_key(params, json.dumps(FILTERS)))
+        if data is not None:
+            payloads[season] = gzip.decompress(data)
+    return payloads
+
+
+def draft_stages(raw: bytes, season: int) -> List[Stage]:
+    """The stages of DraftPage.run for one season, sharing state in order"""
+    page = DraftPage()
+    page.season = season
+    state = {}
+
+    def json_decode():
+        state["jsn"] = json.loads(raw)[0]
+
+    def decode():
+        page.tables = {
+            table: decode_table(table, state["jsn"], columns=columns)
+            for table, columns in DraftPage.table_columns.items()
+        }
+
+    def filter_df():
+        page.positions = get_unique_vals(page.df["Position"])
+        page.teams = get_unique_vals(page.df["Team"])
+        page.drafters = get_unique_vals(page.df["Drafter"])
+        page.keepers = [True, False]
+        page.season_avg = (0.0, float(page.df["seasonAverage"].max()))
+        page.bid_amount = (0, int(page.df["bidAmount"].max()))
+        page.plot_df = page._filter_df()
+
+    def regression_fit():
+        fit_value_line.clear()
+        fit_value_line(
+            page.df["bidAmount"].to_numpy(dtype=float),
+            page.df["seasonAverage"].to_numpy(dtype=float),
+        )
+
+    def figure():
+        value_scatter_base.clear()
+        page._plot_value_scatter()
+
+    return [
+        ("json_decode", json_decode),
+        ("json_normalize", lambda: pd.json_normalize(state["jsn"]["players"])),
+        ("decode", decode),
+        ("merge", page.build_df),
+        ("add_columns", page._add_columns),
+        ("filter_index", lambda: setattr(page, "filter_index", build_filter_index(page.df))),
+        ("filter_df", filter_df),
+        ("regression_fit", regression_fit),
+        ("figure", figure),
+    ]
+
+
+def matchup_stages(raw: bytes, season: int) -> List[Stage]:
+    """The stages of MatchupPage.run for one season, sharing state in order"""
+    page = MatchupPage()
+    state = {}
+
+    def json_decode():
+        state["jsn"] = json.loads(raw)[0]
+
+    def decode():
+        page.tables = {
+            table: decode_table(table, state["jsn"], columns=columns)
+            for table, columns in MatchupPage.table_columns.items()
+        }
+
+    def figures():
+        teams = page.long_matchup_df["Team"].unique()
+        page.plot_league_boxplot(stat="Points")
+        page.plot_team_lineplot(teams=teams, stat="Points")
+        page.plot_team_cumsum(teams=teams, stat="Points")
+        page.plot_team_barplot(teams=teams, stat="Points")
+        page.plot_luck_scatter(team=teams[0])
+
+    return [
+        ("json_decode", json_decode),
+        ("decode", decode),
+        ("build_matchup_df", page.build_matchup_df),
+        ("build_long_matchup_df", page.build_long_matchup_df),
+        ("box_stats", lambda: setattr(page, "state", {"box_stats": page.build_box_stats()})),
+        ("figures", figures),
+    ]
+
+
+def history_stages(payloads: Dict[int, bytes], n_sims: int) -> List[Stage]:
+    """Cross-season stages: fact table, head-to-head and schedule luck"""
+    state = {}
+
+    def decode():
+        frames = defaultdict(list)
+        for season, raw in payloads.items():
+            jsn = json.loads(raw)[0]
+            for table in ("schedule", "teams", "members"):
+                frames[table].append(
+                    decode_table(table, jsn).with_columns(season=pl.lit(season, pl.Int16))
+                )
+        state["tables"] = {table: pl.concat(dfs) for table, dfs in frames.items()}
+
+    def facts():
+        state["facts"] = build_facts(**state["tables"])
+
+    return [
+        ("history_decode", decode),
+        ("matchup_facts", facts),
+        ("head_to_head", lambda: head_to_head(state["facts"])),
+        ("schedule_luck", lambda: season_luck(state["facts"], n_sims=n_sims, seed=0)),
+    ]
+
+
+def run_stages(stages: List[Stage], repeat: int) -> Dict[str, Dict[str, float]]:
+    """
+    Best wall time over repeats, then one traced pass for each stage's peak
+    allocation above what was already held when it started
+    """
+    results = {name: {"seconds": float("inf"), "peak_mb": 0.0} for name, _ in stages}
+    for _ in range(repeat):
+        for name, stage in stages:
+            gc.collect()
+            start = time.perf_counter()
+            stage()
+            elapsed = time.perf_counter() - start
+            results[name]["seconds"] = min(results[name]["seconds"], elapsed)
+    tracemalloc.start()
+    for name, stage in stages:
+        gc.collect()
+        tracemalloc.reset_peak()
+        held = tracemalloc.get_traced_memory()[0]
+        stage()
+        peak = tracemalloc.get_traced_memory()[1] - held
+        results[name]["peak_mb"] = peak / 1024**2
+    tracemalloc.stop()
+    return results
+
+
+def run_scenario(
+    payloads: Dict[int, bytes], repeat: int, n_sims: int
+) -> Dict[str, Dict[str, float]]:
+    """Sum stage times (max peaks) over seasons, plus the cross-season stages"""
+    totals = defaultdict(lambda: {"seconds": 0.0, "peak_mb": 0.0})
+    for page, make_stages in (("draft", draft_stages), ("matchup", matchup_stages)):
+        for season, raw in payloads.items():
+            for name, result in run_stages(make_stages(raw, season), repeat).items():
+                total = totals[f"{page}.{name}"]
+                total["seconds"] += result["seconds"]
+                total["peak_mb"] = max(total["peak_mb"], result["peak_mb"])
+    for name, result in run_stages(history_stages(payloads, n_sims), repeat).items():
+        totals[f"history.{name}"] = result
+    return dict(totals)
+
+
+def compare(
+    results: Dict[str, Dict[str, Dict[str, float]]],
+    baseline: Dict[str, Dict[str, Dict[str, float]]],
+    tolerance: float,
+) -> List[str]:
+    """Print every stage next to its baseline and return the ones that regressed"""
+    regressions = []
+    print(f"{'stage':<40}{'ms':>10}{'peak MB':>10}{'base ms':>10}{'change':>9}")
+    for scenario, stages in results.items():
+        for stage, result in stages.items():
+            name = f"{scenario}/{stage}"
+            ms = result["seconds"] * 1000
+            base = baseline.get(scenario, {}).get(stage)
+            line = f"{name:<40}{ms:>10.1f}{result['peak_mb']:>10.1f}"
+            if base:
+                base_ms = base["seconds"] * 1000
+                change = ms / base_ms - 1 if base_ms else 0.0
+                line += f"{base_ms:>10.1f}{change:>+9.0%}"
+                # ignore sub-millisecond noise
+                if change > tolerance and ms - base_ms > 1:
+                    regressions.append(name)
+                    line += "  REGRESSION"
+            print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time and measure peak memory of each page-building stage "
+        "against recorded payloads (record them with "
+        "ESPN_TRANSPORT=record python ingest.py) and a synthetic large league"
+    )
+    parser.add_argument("--recordings", default=RECORDINGS_DIR)
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=["single", "all", "synthetic"],
+        default=["single", "all", "synthetic"],
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sims", type=int, default=100_000)
+    parser.add_argument("--synthetic-teams", type=int, default=32)
+    parser.add_argument("--synthetic-players", type=int, default=20_000)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    # stub out rendering but keep figure serialization in the measurement
+    st.plotly_chart = lambda fig, **kwargs: fig.to_json()
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+    warnings.simplefilter("ignore", FutureWarning)
+
+    recorded = recorded_seasons(Recordings(args.recordings))
+    scenarios = {}
+    if recorded:
+        latest = max(recorded)
+        scenarios["single"] = {latest: recorded[latest]}
+        scenarios["all"] = recorded
+    scenarios["synthetic"] = {
+        2100: synthetic_season(
+            2100, n_teams=args.synthetic_teams, n_players=args.synthetic_players
+        )
+    }
+
+    results = {}
+    for scenario in args.scenarios:
+        if scenario not in scenarios:
+            print(f"skipping {scenario}: no recordings in {args.recordings}")
+            continue
+        results[scenario] = run_scenario(scenarios[scenario], args.repeat, args.sims)
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2))
+        print(f"saved baseline to {args.baseline}")
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions and not args.save_baseline:
+        raise SystemExit(f"{len(regressions)} stage(s) regressed: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
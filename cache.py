@@ -0,0 +1,306 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Any, ContextManager, Iterable, Iterator, Optional, Union
+
+CACHE_DIR = Path(os.environ.get("ESPN_CACHE_DIR", ".espn_cache"))
+CACHE_MAX_BYTES = int(os.environ.get("ESPN_CACHE_MAX_BYTES", 512 * 1024**2))
+CACHE_BACKEND = os.environ.get("ESPN_CACHE_BACKEND", "sqlite")  # sqlite or files
+# seconds a process may hold the fetch lease for a key before others take over
+LEASE_TIMEOUT = 120
+LEASE_POLL = 0.25
+# reads only bump the LRU clock when it is older than this, to keep reads read-only
+ACCESS_RESOLUTION = 60
+
+# views that change minute to minute while games are being played
+LIVE_VIEWS = {
+    "kona_game_state",
+    "mBoxscore",
+    "mLiveScoring",
+    "mMatchup",
+    "mMatchupScore",
+    "mPendingTransactions",
+    "mRoster",
+}
+LIVE_TTL = 60
+CURRENT_SEASON_TTL = 60 * 60
+
+# fantasy playoffs can run into the first week of january
+SEASON_END_MONTH = 2
+
+
+def current_season(today: Optional[datetime] = None) -> int:
+    """Return the latest season that may still change"""
+    today = today or datetime.today()
+    return today.year if today.month >= SEASON_END_MONTH else today.year - 1
+
+
+def cache_key(
+    league_id: Any, view: Union[str, Iterable[str]], params: dict, filters: Any
+) -> str:
+    """Stable hash of everything that determines an ESPN response"""
+    raw = json.dumps(
+        {"league": league_id, "view": view, "params": params, "filters": filters},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def ttl_for(view: Union[str, Iterable[str]], season: Optional[int]) -> Optional[float]:
+    """
+    Seconds a cached response stays fresh; None means it never expires.
+    Completed seasons are immutable, the current season expires quickly.
+    """
+    if season is not None and int(season) < current_season():
+        return None
+    views = {view} if isinstance(view, str) else set(view)
+    if views & LIVE_VIEWS:
+        return LIVE_TTL
+    return CURRENT_SEASON_TTL
+
+
+class ResponseCache:
+    """Size-bounded, disk-backed cache of ESPN API responses"""
+
+    def __init__(self, directory: Path = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._size = sum(path.stat().st_size for path in self._paths())
+
+    def _paths(self):
+        return self.directory.glob("*.json.gz")
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json.gz"
+
+    def get(self, key: str, ttl: Optional[float] = None) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or stale"""
+        path = self._path(key)
+        try:
+            stat = path.stat()
+            if ttl is not None and time.time() - stat.st_mtime > ttl:
+                self.stats["expired"] += 1
+                raise FileNotFoundError
+            with gzip.open(path, "rb") as f:
+                value = json.loads(f.read())
+            # bump access time for LRU eviction, keep mtime for freshness
+            os.utime(path, (time.time(), stat.st_mtime))
+        except (FileNotFoundError, OSError, ValueError):
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Write value to disk and evict least recently used entries if over budget"""
+        path = self._path(key)
+        data = gzip.compress(json.dumps(value).encode(), compresslevel=1)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        with self._lock:
+            old_size = path.stat().st_size if path.exists() else 0
+            os.replace(tmp, path)
+            self._size += len(data) - old_size
+            self.stats["writes"] += 1
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def touch(self, key: str) -> None:
+        """Mark the cached value for key as fetched just now"""
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self) -> None:
+        entries = []
+        for path in self._paths():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, stat.st_size, path))
+        entries.sort()
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._size <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            self._size -= size
+            self.stats["evictions"] += 1
+
+    def lease(self, key: str) -> ContextManager[bool]:
+        """Files are not coordinated across processes; only SQLiteCache leases keys"""
+        return nullcontext(False)
+
+    def clear(self) -> None:
+        """Remove every cached response"""
+        with self._lock:
+            for path in self._paths():
+                path.unlink(missing_ok=True)
+            self._size = 0
+
+
+class SQLiteCache:
+    """
+    Size-bounded cache of ESPN API responses in one SQLite file shared by
+    every process on the host. WAL mode lets readers run alongside the
+    single writer, and fetch leases stop replicas refetching the same key.
+    """
+
+    def __init__(
+        self,
+        path: Path = CACHE_DIR / "responses.sqlite3",
+        max_bytes: int = CACHE_MAX_BYTES,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.stats = Counter()
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, "
+                "value BLOB, bytes INTEGER, created REAL, accessed REAL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases "
+                "(key TEXT PRIMARY KEY, owner TEXT, expires REAL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; `with` on it wraps a transaction"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, ttl: Optional[float] = None) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or stale"""
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT value, created, accessed FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is not None and ttl is not None and now - row[1] > ttl:
+            self.stats["expired"] += 1
+            row = None
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        try:
+            value = json.loads(gzip.decompress(row[0]))
+        except (OSError, ValueError):
+            self.stats["misses"] += 1
+            return None
+        if now - row[2] > ACCESS_RESOLUTION:
+            with conn:
+                conn.execute(
+                    "UPDATE entries SET accessed = ? WHERE key = ?", (now, key)
+                )
+        self.stats["hits"] += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Store value and evict least recently used entries if over budget"""
+        data = gzip.compress(json.dumps(value).encode(), compresslevel=1)
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            # take the write lock up front so the size check and eviction are atomic
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now, now),
+            )
+            self.stats["writes"] += 1
+            (size,) = conn.execute(
+                "SELECT COALESCE(SUM(bytes), 0) FROM entries"
+            ).fetchone()
+            if size > self.max_bytes:
+                evict = []
+                for old_key, nbytes in conn.execute(
+                    "SELECT key, bytes FROM entries WHERE key != ? ORDER BY accessed",
+                    (key,),
+                ):
+                    if size <= self.max_bytes:
+                        break
+                    evict.append((old_key,))
+                    size -= nbytes
+                conn.executemany("DELETE FROM entries WHERE key = ?", evict)
+                self.stats["evictions"] += len(evict)
+
+    def touch(self, key: str) -> None:
+        """Mark the cached value for key as fetched just now"""
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "UPDATE entries SET created = ?, accessed = ? WHERE key = ?",
+                (now, now, key),
+            )
+
+    @contextmanager
+    def lease(self, key: str, timeout: float = LEASE_TIMEOUT) -> Iterator[bool]:
+        """
+        Hold the host-wide fetch lease for key, waiting while another process
+        holds it. Yields whether we waited, i.e. whether the value may have
+        been cached in the meantime. An expired lease is taken over.
+        """
+        conn = self._connection()
+        owner = f"{os.getpid()}:{threading.get_ident()}"
+        waited = False
+        while True:
+            now = time.time()
+            with conn:
+                conn.execute(
+                    "DELETE FROM leases WHERE key = ? AND expires < ?", (key, now)
+                )
+                claimed = conn.execute(
+                    "INSERT OR IGNORE INTO leases VALUES (?, ?, ?)",
+                    (key, owner, now + timeout),
+                ).rowcount
+            if claimed:
+                break
+            waited = True
+            self.stats["lease_waits"] += 1
+            time.sleep(LEASE_POLL)
+        try:
+            yield waited
+        finally:
+            with conn:
+                conn.execute(
+                    "DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner)
+                )
+
+    def clear(self) -> None:
+        """Remove every cached response"""
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM entries")
+        conn.execute("VACUUM")
+
+
+def make_cache(backend: str = CACHE_BACKEND) -> Union[ResponseCache, SQLiteCache]:
+    """The response cache selected by ESPN_CACHE_BACKEND"""
+    if backend == "files":
+        return ResponseCache()
+    return SQLiteCache()
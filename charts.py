@@ -0,0 +1,104 @@
+import os
+from typing import List, NamedTuple, Optional, Type, Union
+
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# most points a single chart sends to the browser before it is downsampled
+POINT_BUDGET = int(os.environ.get("ESPN_CHART_POINTS", 5000))
+# above this many points scatters render with WebGL instead of SVG
+WEBGL_POINTS = 1000
+
+
+class BoxStats(NamedTuple):
+    stats: pd.DataFrame  # keys, q1, median, q3, lowerfence, upperfence
+    outliers: pd.DataFrame  # keys and values outside the fences, at most POINT_BUDGET
+    order: List  # x categories by ascending total, like categoryorder="total ascending"
+
+
+def box_stats(
+    df: pd.DataFrame, x: str, y: str, color: Optional[str] = None
+) -> BoxStats:
+    """
+    Quartiles and Tukey whiskers (the furthest values within 1.5 IQR of the
+    box) of y per x and color, the same summary px.box computes in the
+    browser from every row
+    """
+    keys = [key for key in (color, x) if key is not None]
+    df = df[keys + [y]].dropna(subset=[y])
+    grouped = df.groupby(keys, observed=True, sort=False)[y]
+    stats = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ["q1", "median", "q3"]
+    iqr = stats["q3"] - stats["q1"]
+    bounds = pd.DataFrame(
+        {"low": stats["q1"] - 1.5 * iqr, "high": stats["q3"] + 1.5 * iqr}
+    ).reset_index()
+    rows = df.merge(bounds, on=keys, how="left")
+    inside = rows[y].between(rows["low"], rows["high"])
+    fences = rows[inside].groupby(keys, observed=True, sort=False)[y].agg(["min", "max"])
+    stats = stats.join(
+        fences.rename(columns={"min": "lowerfence", "max": "upperfence"})
+    ).reset_index()
+    order = df.groupby(x, observed=True)[y].sum().sort_values().index.tolist()
+    return BoxStats(stats, sample_points(rows.loc[~inside, keys + [y]]), order)
+
+
+def box_figure(box: BoxStats, x: str, y: str, color: Optional[str] = None) -> go.Figure:
+    """Grouped box plot drawn from precomputed statistics, one trace per color"""
+    fig = go.Figure()
+    groups = (
+        box.stats.groupby(color, observed=True, sort=False)
+        if color is not None
+        else [(y, box.stats)]
+    )
+    palette = px.colors.qualitative.Plotly
+    for i, (name, stats) in enumerate(groups):
+        marker = dict(color=palette[i % len(palette)])
+        fig.add_trace(
+            go.Box(
+                x=stats[x],
+                q1=stats["q1"],
+                median=stats["median"],
+                q3=stats["q3"],
+                lowerfence=stats["lowerfence"],
+                upperfence=stats["upperfence"],
+                name=str(name),
+                legendgroup=str(name),
+                offsetgroup=str(name),
+                marker=marker,
+            )
+        )
+        outliers = (
+            box.outliers[box.outliers[color] == name]
+            if color is not None
+            else box.outliers
+        )
+        fig.add_trace(
+            go.Scatter(
+                x=outliers[x],
+                y=outliers[y],
+                mode="markers",
+                name=str(name),
+                legendgroup=str(name),
+                offsetgroup=str(name),
+                showlegend=False,
+                marker=marker,
+            )
+        )
+    fig.update_layout(boxmode="group", scattermode="group", legend_title_text=color)
+    fig.update_xaxes(title=x, categoryorder="array", categoryarray=box.order)
+    fig.update_yaxes(title=y)
+    return fig
+
+
+def sample_points(df: pd.DataFrame, budget: int = POINT_BUDGET) -> pd.DataFrame:
+    """At most budget rows, a fixed random sample so reruns draw the same points"""
+    if len(df) <= budget:
+        return df
+    return df.sample(n=budget, random_state=0).sort_index()
+
+
+def scatter_type(points: int) -> Type[Union[go.Scatter, go.Scattergl]]:
+    """SVG scatter for small traces, WebGL once the browser would slow down"""
+    return go.Scattergl if points > WEBGL_POINTS else go.Scatter
@@ -0,0 +1,75 @@
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from enumerations import POSITIONS, TEAMS
+
+
+class CodeLookup:
+    """
+    An id -> name enumeration as an array indexed by id, decoding a whole
+    column of ids into a categorical with one take instead of a dict .map
+    """
+
+    def __init__(self, mapping: Dict[int, Optional[str]]):
+        # missing names, e.g. a team without a nickname, decode to NaN
+        categories = list(dict.fromkeys(v for v in mapping.values() if not pd.isna(v)))
+        self.dtype = pd.CategoricalDtype(categories)
+        self.codes = np.full(max(mapping, default=-1) + 1, -1, dtype=np.int16)
+        for key, value in mapping.items():
+            if not pd.isna(value):
+                self.codes[key] = categories.index(value)
+
+    def decode(self, ids: pd.Series) -> pd.Categorical:
+        """Names of the ids; missing and unknown ids become NaN, as with .map"""
+        ids = ids.to_numpy(dtype=float, na_value=np.nan)
+        known = (ids >= 0) & (ids < len(self.codes))
+        codes = np.full(len(ids), -1, dtype=np.int16)
+        codes[known] = self.codes[ids[known].astype(np.intp)]
+        return pd.Categorical.from_codes(codes, dtype=self.dtype)
+
+
+POSITION_CODES = CodeLookup(POSITIONS)
+TEAM_CODES = CodeLookup(TEAMS)
+
+
+def compact(
+    df: pd.DataFrame,
+    columns: Optional[Sequence[str]] = None,
+    categorical: Iterable[str] = (),
+) -> pd.DataFrame:
+    """
+    Keep only the given columns, dictionary encode the categorical ones and
+    downcast numbers to the smallest of int16/int32 and float32 that holds
+    them. int8 is skipped so arithmetic like max() + 2 cannot wrap.
+    """
+    df = (df[list(columns)] if columns is not None else df).copy()
+    for col in categorical:
+        df[col] = df[col].astype("category")
+    for col in df.columns:
+        dtype = df[col].dtype
+        if pd.api.types.is_bool_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_integer_dtype(dtype):
+            values = pd.to_numeric(df[col], downcast="integer")
+            df[col] = values.astype(np.promote_types(values.dtype, np.int16))
+        elif pd.api.types.is_float_dtype(dtype):
+            df[col] = df[col].astype(np.float32)
+    return df
+
+
+def frame_bytes(frames: Iterable[object], exclude: Iterable[object] = ()) -> int:
+    """Deep size of the pandas and polars frames among frames, each counted once"""
+    seen = {id(frame) for frame in exclude}
+    total = 0
+    for frame in frames:
+        if id(frame) in seen:
+            continue
+        seen.add(id(frame))
+        if isinstance(frame, pd.DataFrame):
+            total += int(frame.memory_usage(deep=True, index=True).sum())
+        elif isinstance(frame, pl.DataFrame):
+            total += int(frame.estimated_size())
+    return total
@@ -0,0 +1,175 @@
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import polars as pl
+
+
+class Field(NamedTuple):
+    path: Tuple[str, ...]
+    dtype: pl.DataType
+
+
+class Schema(NamedTuple):
+    """
+    Typed projection of the records found at record_path in a season json.
+    If explode_path is set, each record's nested list at that path becomes
+    the rows, and meta fields are read from the parent record.
+    """
+
+    record_path: Tuple[str, ...]
+    fields: Dict[str, Field]
+    explode_path: Tuple[str, ...] = ()
+    meta: Dict[str, Field] = {}
+
+
+def fields(**dtypes: pl.DataType) -> Dict[str, Field]:
+    """Build fields named like json_normalize columns, e.g. player__fullName -> player.fullName"""
+    return {
+        name.replace("__", "."): Field(tuple(name.split("__")), dtype)
+        for name, dtype in dtypes.items()
+    }
+
+
+PLAYER_SCHEMA = Schema(
+    record_path=("players",),
+    fields=fields(
+        id=pl.Int64,
+        player__fullName=pl.Utf8,
+        player__defaultPositionId=pl.Int8,
+        player__proTeamId=pl.Int8,
+        player__injured=pl.Boolean,
+        player__ownership__auctionValueAverage=pl.Float64,
+        player__ownership__averageDraftPosition=pl.Float64,
+        player__ownership__percentOwned=pl.Float64,
+        player__stats=pl.Object,
+    ),
+)
+
+PICK_SCHEMA = Schema(
+    record_path=("draftDetail", "picks"),
+    fields=fields(
+        playerId=pl.Int64,
+        teamId=pl.Int16,
+        bidAmount=pl.Int16,
+        keeper=pl.Boolean,
+        overallPickNumber=pl.Int16,
+        roundId=pl.Int16,
+        nominatingTeamId=pl.Int16,
+    ),
+)
+
+TEAM_SCHEMA = Schema(
+    record_path=("teams",),
+    fields=fields(
+        id=pl.Int16,
+        location=pl.Utf8,
+        nickname=pl.Utf8,
+        abbrev=pl.Utf8,
+        primaryOwner=pl.Utf8,
+    ),
+)
+
+MEMBER_SCHEMA = Schema(
+    record_path=("members",),
+    fields=fields(
+        id=pl.Utf8,
+        displayName=pl.Utf8,
+        firstName=pl.Utf8,
+        lastName=pl.Utf8,
+    ),
+)
+
+SCHEDULE_SCHEMA = Schema(
+    record_path=("schedule",),
+    fields=fields(
+        id=pl.Int32,
+        matchupPeriodId=pl.Int16,
+        winner=pl.Utf8,
+        home__teamId=pl.Int16,
+        home__totalPoints=pl.Float64,
+        away__teamId=pl.Int16,
+        away__totalPoints=pl.Float64,
+    ),
+)
+
+# one row per (player, stats entry), e.g. id "002021" is the 2021 actual season total
+STAT_SCHEMA = Schema(
+    record_path=("players",),
+    explode_path=("player", "stats"),
+    meta={"playerId": Field(("id",), pl.Int64)},
+    fields=fields(
+        id=pl.Utf8,
+        seasonId=pl.Int16,
+        scoringPeriodId=pl.Int16,
+        statSourceId=pl.Int8,
+        statSplitTypeId=pl.Int8,
+        appliedTotal=pl.Float64,
+        appliedAverage=pl.Float64,
+    ),
+)
+
+
+def lineup_schema(side: str) -> Schema:
+    """One row per roster entry of the home or away side of each mBoxscore matchup"""
+    return Schema(
+        record_path=("schedule",),
+        explode_path=(side, "rosterForCurrentScoringPeriod", "entries"),
+        meta={"teamId": Field((side, "teamId"), pl.Int16)},
+        fields=fields(
+            playerId=pl.Int64,
+            lineupSlotId=pl.Int8,
+            playerPoolEntry__appliedStatTotal=pl.Float64,
+            playerPoolEntry__player__eligibleSlots=pl.List(pl.Int8),
+        ),
+    )
+
+
+HOME_LINEUP_SCHEMA = lineup_schema("home")
+AWAY_LINEUP_SCHEMA = lineup_schema("away")
+
+
+def _extract(records: List[dict], path: Tuple[str, ...]) -> List[Any]:
+    if len(path) == 1:
+        key = path[0]
+        return [record.get(key) for record in records]
+    values = []
+    for record in records:
+        for key in path:
+            record = record.get(key) if isinstance(record, dict) else None
+        values.append(record)
+    return values
+
+
+def records_at(jsn: dict, record_path: Tuple[str, ...]) -> List[dict]:
+    """Walk a season json down to the list of records at record_path"""
+    for key in record_path:
+        jsn = jsn.get(key) or {}
+    return jsn or []
+
+
+def decode(
+    jsn: dict, schema: Schema, columns: Optional[Sequence[str]] = None
+) -> pl.DataFrame:
+    """
+    Extract only the requested columns of schema from a season json straight
+    into typed columns, skipping every other field of the payload
+    """
+    records = records_at(jsn, schema.record_path)
+    columns = list(schema.meta) + list(schema.fields) if columns is None else columns
+    values = {}
+    if schema.explode_path:
+        children = [records_at(record, schema.explode_path) for record in records]
+        for name in columns:
+            if name in schema.meta:
+                parent_values = _extract(records, schema.meta[name].path)
+                values[name] = [
+                    value
+                    for value, rows in zip(parent_values, children)
+                    for _ in range(len(rows))
+                ]
+        records = [row for rows in children for row in rows]
+    series = []
+    for name in columns:
+        field = schema.meta.get(name) or schema.fields[name]
+        data = values[name] if name in values else _extract(records, field.path)
+        series.append(pl.Series(name, data, dtype=field.dtype, strict=False))
+    return pl.DataFrame(series)
@@ -5,7 +5,8 @@ VIEWS = [
     "mBoxscore",
     "mDraftDetail",
     "mLiveScoring",
-    "mMatchup" "mMatchupScore",
+    "mMatchup",
+    "mMatchupScore",
     "mNav",
     "mPendingTransactions",
     "mPositionalRatings",
@@ -21,6 +22,26 @@ VIEWS = [
     "players_wl",
 ]
 
+# top level sections of the leagueHistory payload populated by each view
+VIEW_SECTIONS = {
+    "kona_player_info": ["players"],
+    "mBoxscore": ["schedule"],
+    "mDraftDetail": ["draftDetail"],
+    "mLiveScoring": ["schedule"],
+    "mMatchup": ["schedule", "teams"],
+    "mMatchupScore": ["schedule"],
+    "mNav": ["members", "teams"],
+    "mRoster": ["teams"],
+    "mSchedule": ["schedule"],
+    "mSettings": ["settings"],
+    "mStatus": ["status"],
+    "mTeam": ["members", "teams"],
+    "mTransactions2": ["transactions"],
+}
+
+# league identifiers returned with every view
+PAYLOAD_META = ["gameId", "id", "scoringPeriodId", "seasonId", "segmentId"]
+
 API_PARAMS = [
     "seasonId",
     "matchupPeriod",
@@ -72,6 +93,33 @@ TEAMS = {
     34: "HOU",
 }
 
+# roster slots in mBoxscore lineups and mSettings lineupSlotCounts
+LINEUP_SLOTS = {
+    0: "QB",
+    1: "TQB",
+    2: "RB",
+    3: "RB/WR",
+    4: "WR",
+    5: "WR/TE",
+    6: "TE",
+    7: "OP",
+    8: "DT",
+    9: "DE",
+    10: "LB",
+    11: "DL",
+    12: "CB",
+    13: "S",
+    14: "DB",
+    15: "DP",
+    16: "D/ST",
+    17: "K",
+    18: "P",
+    19: "HC",
+    20: "BE",
+    21: "IR",
+    23: "FLEX",
+}
+
 STATS = {
     0: "pass_att",
     1: "pass_comp",
@@ -1,46 +1,319 @@
+import hashlib
 import os
-from typing import List
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 import json
 import requests
 from dotenv import load_dotenv
-from enumerations import VIEWS, API_PARAMS
+from requests.adapters import HTTPAdapter
+from cache import ResponseCache, SQLiteCache, cache_key, ttl_for
+from enumerations import VIEWS, API_PARAMS, PAYLOAD_META, VIEW_SECTIONS
+from metrics import span
+from throttle import SingleFlight, TokenBucket, backoff_delays
+from transport import Transport, make_transport
 
 load_dotenv()
 
+API_URL = os.environ.get("ESPN_API_URL", "https://fantasy.espn.com/apis/v3/games/ffl")
+MAX_WORKERS = 8
+RATE_LIMIT = float(os.environ.get("ESPN_RATE_LIMIT", 5))  # requests per second
+RATE_BURST = int(os.environ.get("ESPN_RATE_BURST", 10))
+MAX_RETRIES = int(os.environ.get("ESPN_MAX_RETRIES", 4))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+REQUEST_TIMEOUT = 30
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+FILTERS = {
+    "players": {
+        "limit": 5000,
+        "sortDraftRanks": {
+            "sortPriority": 100,
+            "sortAsc": True,
+            "value": "STANDARD"
+        }
+    }
+}
+
+
+class ESPNAPIError(Exception):
+    """Raised when ESPN cannot return a usable response"""
+
 
 class ESPNFantasyAPI:
     """Class for pulling data from the ESPN fantasy API"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        cache: Optional[Union[ResponseCache, SQLiteCache]] = None,
+        max_workers: int = MAX_WORKERS,
+        rate_limit: float = RATE_LIMIT,
+        rate_burst: int = RATE_BURST,
+        max_retries: int = MAX_RETRIES,
+        transport: Optional[Transport] = None,
+    ):
         self.cookies = {
             "swid": f"{os.environ.get('SWID')}",
             "espn_s2": f"{os.environ.get('ESPN_S2')}",
         }
-        league_id = os.environ.get("LEAGUE_ID")
-        self.url = (
-            f"https://fantasy.espn.com/apis/v3/games/ffl/leagueHistory/{league_id}"
-        )
+        self.league_id = os.environ.get("LEAGUE_ID")
+        self.url = f"{API_URL}/leagueHistory/{self.league_id}"
         self.views = VIEWS
         self.api_params = API_PARAMS
+        self.cache = cache
+        self.max_workers = max_workers
+        self.session = requests.Session()
+        self.session.cookies.update(self.cookies)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.transport = transport or make_transport(self.session)
+        self.bucket = TokenBucket(rate=rate_limit, capacity=rate_burst)
+        self.max_retries = max_retries
+        self.inflight = SingleFlight()
+        self.stats = Counter()
+        self.etags: Dict[Tuple[int, Tuple[int, ...]], str] = {}
         self.response = None
 
-    def get(self, view: str, **kwargs) -> List[dict]:
+    def get(
+        self,
+        view: Union[str, List[str]],
+        *,
+        refresh: bool = False,
+        filters: Optional[dict] = None,
+        **kwargs,
+    ) -> List[dict]:
         """
-        Return a list of jsons for the specified ESPN fantasy football endpoint
+        Return a list of jsons for the specified ESPN fantasy football endpoint.
+        Several views can be passed as a list and are merged into one request.
+        With refresh the cache is bypassed and overwritten with a new fetch.
+        filters replaces the default x-fantasy-filter, FILTERS.
         """
-        filters = {
-            "players": {
-                "limit": 5000,
-                "sortDraftRanks": {
-                    "sortPriority": 100,
-                    "sortAsc": True,
-                    "value": "STANDARD"
-                }
-            }
-        }
+        filters = filters or FILTERS
         headers = {'x-fantasy-filter': json.dumps(filters)}
+        if not isinstance(view, str):
+            view = sorted(set(view))
         params = {"view": view}
         if kwargs:
             params.update(**kwargs)
-        self.response = requests.get(url=self.url, cookies=self.cookies, headers=headers, params=params)
-        return self.response.json()
+        key = cache_key(self.league_id, view, params, filters)
+        ttl = ttl_for(view, params.get("seasonId"))
+        with span("espn.get") as get_span:
+            if self.cache is not None and not refresh:
+                cached = self.cache.get(key, ttl=ttl)
+                if cached is not None:
+                    get_span.labels["source"] = "cache"
+                    get_span.rows = len(cached)
+                    return cached
+            jsn, shared = self.inflight.do(
+                key, lambda: self._fetch_cached(key, ttl, headers, params)
+            )
+            get_span.labels["source"] = "coalesced" if shared else "espn"
+            get_span.rows = len(jsn)
+        if shared:
+            self.stats["coalesced"] += 1
+        return jsn
+
+    def sync(self, view: Union[str, List[str]], season: int) -> List[dict]:
+        """
+        Refresh a season request incrementally. When a cached copy with the
+        mMatchup schedule exists only its undecided matchup periods are
+        refetched and merged in; other views in the request are small and
+        refetched in full. Anything else falls back to get(refresh=True).
+        """
+        if not isinstance(view, str):
+            view = sorted(set(view))
+        views = [view] if isinstance(view, str) else view
+        params = {"view": view, "seasonId": season}
+        key = cache_key(self.league_id, view, params, FILTERS)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is None or "mMatchup" not in views:
+            return self.get(view, refresh=True, seasonId=season)
+        with span("espn.sync") as sync_span:
+            jsn = dict(cached[0])
+            others = [v for v in views if v != "mMatchup"]
+            if others:
+                jsn.update(self.get(others, refresh=True, seasonId=season)[0])
+            jsn["schedule"] = self._sync_schedule(
+                season,
+                jsn.get("schedule", []),
+                jsn.get("status", {}).get("currentMatchupPeriod"),
+            )
+            sync_span.rows = len(jsn["schedule"])
+        if jsn == cached[0]:
+            # still current, so keep it fresh rather than let it expire and refetch
+            self.stats["sync_unchanged"] += 1
+            self.cache.touch(key)
+        else:
+            self.cache.set(key, [jsn])
+        return [jsn]
+
+    def _sync_schedule(
+        self, season: int, schedule: List[dict], current: Optional[int] = None
+    ) -> List[dict]:
+        """
+        Refetch the undecided matchup periods up to the one after the
+        current period (the first undecided one if unknown), conditionally
+        on the last ETag, and replace the periods whose content hash changed.
+        Later periods hold no scores yet; the next one may get playoff seeds.
+        """
+        undecided = sorted(
+            {m["matchupPeriodId"] for m in schedule if m.get("winner") == "UNDECIDED"}
+        )
+        if not undecided:
+            return schedule
+        current = current or undecided[0]
+        periods = [period for period in undecided if period <= current + 1]
+        filters = {
+            **FILTERS,
+            "schedule": {"filterMatchupPeriodIds": {"value": periods}},
+        }
+        headers = {"x-fantasy-filter": json.dumps(filters)}
+        etag_key = (season, tuple(periods))
+        if etag_key in self.etags:
+            headers["If-None-Match"] = self.etags[etag_key]
+        params = {"view": "mMatchup", "seasonId": season}
+        response = self._request(headers, params)
+        if response.status_code == 304:
+            self.stats["not_modified"] += 1
+            return schedule
+        if "ETag" in response.headers:
+            self.etags[etag_key] = response.headers["ETag"]
+        merged = by_period(schedule)
+        for period, matchups in by_period(
+            self._json(response, params)[0].get("schedule", [])
+        ).items():
+            if content_hash(matchups) == content_hash(merged.get(period, [])):
+                self.stats["periods_unchanged"] += 1
+            else:
+                merged[period] = matchups
+                self.stats["periods_changed"] += 1
+        return [matchup for period in sorted(merged) for matchup in merged[period]]
+
+    def _fetch_cached(
+        self, key: str, ttl: Optional[float], headers: dict, params: dict
+    ) -> List[dict]:
+        """
+        Fetch and cache under the cache's fetch lease, so processes sharing
+        the cache fetch each key once; after waiting on another process's
+        lease the value is usually already cached
+        """
+        if self.cache is None:
+            return self._fetch(headers, params)
+        with self.cache.lease(key) as waited:
+            jsn = self.cache.get(key, ttl=ttl) if waited else None
+            if jsn is None:
+                jsn = self._fetch(headers, params)
+                self.cache.set(key, jsn)
+        return jsn
+
+    def _fetch(self, headers: dict, params: dict) -> List[dict]:
+        """Rate limited request, retried with jittered exponential backoff"""
+        return self._json(self._request(headers, params), params)
+
+    def _request(self, headers: dict, params: dict) -> requests.Response:
+        """Send one logical request, retrying throttling and server errors"""
+        delays = backoff_delays(base=BACKOFF_BASE, cap=BACKOFF_CAP)
+        for attempt in range(self.max_retries + 1):
+            if self.bucket.acquire():
+                self.stats["throttled"] += 1
+            self.stats["requests"] += 1
+            delay = next(delays)
+            try:
+                with span("espn.fetch") as fetch_span:
+                    response = self.transport.get(
+                        url=self.url,
+                        headers=headers,
+                        params=params,
+                        timeout=REQUEST_TIMEOUT,
+                    )
+                    fetch_span.labels["status"] = str(response.status_code)
+                    fetch_span.bytes = len(response.content)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            else:
+                self.response = response
+                if response.status_code not in RETRY_STATUSES:
+                    break
+                error = f"HTTP {response.status_code}"
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = min(float(retry_after), BACKOFF_CAP)
+            if attempt == self.max_retries:
+                self.stats["failures"] += 1
+                raise ESPNAPIError(
+                    f"{params} failed after {attempt + 1} attempts: {error}"
+                )
+            self.stats["retried"] += 1
+            time.sleep(delay)
+        if not response.ok:
+            self.stats["failures"] += 1
+            raise ESPNAPIError(f"{params} returned HTTP {response.status_code}")
+        return response
+
+    def _json(self, response: requests.Response, params: dict) -> List[dict]:
+        try:
+            return response.json()
+        except ValueError as e:
+            self.stats["failures"] += 1
+            raise ESPNAPIError(f"{params} returned invalid json") from e
+
+    def get_views(self, views: List[str], **kwargs) -> Dict[str, List[dict]]:
+        """
+        Fetch several views in a single round trip and split the merged
+        payload into the sections each view populates
+        """
+        jsn = self.get(view=views, **kwargs)
+        return {view: split_view(jsn, view) for view in views}
+
+    def get_many(
+        self, fetches: Iterable[Tuple[str, Optional[int], Optional[dict]]]
+    ) -> List[List[dict]]:
+        """
+        Fetch (view, seasonId, params) triples concurrently over the pooled
+        session and return the jsons in the order they were requested
+        """
+
+        def fetch(request: Tuple[str, Optional[int], Optional[dict]]) -> List[dict]:
+            view, season, params = request
+            kwargs = dict(params or {})
+            if season is not None:
+                kwargs["seasonId"] = season
+            return self.get(view=view, **kwargs)
+
+        fetches = list(fetches)
+        workers = max(1, min(self.max_workers, len(fetches)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(fetch, fetches))
+
+    def get_seasons(
+        self, views: Iterable[str], seasons: Iterable[int], **kwargs
+    ) -> Dict[Tuple[str, int], List[dict]]:
+        """Fetch every view for every season in one concurrent batch"""
+        views = list(views)
+        fetches = [(view, season, kwargs) for season in seasons for view in views]
+        jsons = self.get_many(fetches)
+        return {(view, season): jsn for (view, season, _), jsn in zip(fetches, jsons)}
+
+
+def by_period(schedule: List[dict]) -> Dict[int, List[dict]]:
+    """Schedule entries grouped by matchup period"""
+    periods = defaultdict(list)
+    for matchup in schedule:
+        periods[matchup["matchupPeriodId"]].append(matchup)
+    return dict(periods)
+
+
+def content_hash(matchups: List[dict]) -> str:
+    """Order-independent hash of a matchup period's entries"""
+    raw = json.dumps(sorted(matchups, key=lambda m: m.get("id", 0)), sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def split_view(jsn: List[dict], view: str) -> List[dict]:
+    """Keep only the sections of a (possibly merged) payload belonging to view"""
+    if view not in VIEW_SECTIONS:
+        return jsn
+    keys = VIEW_SECTIONS[view] + PAYLOAD_META
+    return [{key: season[key] for key in keys if key in season} for season in jsn]
@@ -0,0 +1,68 @@
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def _key(value: Any) -> Hashable:
+    """Normalize missing values so NaN/None/NA all share one bitset"""
+    return None if pd.isna(value) else value
+
+
+class FilterIndex:
+    """
+    Precomputed lookups for filtering a frame on categorical membership and
+    numeric ranges. Categorical columns keep a packed bitset of rows per
+    value and numeric columns keep a sorted copy, so a filter is a handful
+    of bitwise ANDs instead of isin/between over object columns.
+    """
+
+    def __init__(self, df: pd.DataFrame, categorical: List[str], numeric: List[str]):
+        self.n_rows = len(df)
+        self.codes: Dict[str, np.ndarray] = {}
+        self.categories: Dict[str, Dict[Hashable, int]] = {}
+        self.bitsets: Dict[str, List[np.ndarray]] = {}
+        for col in categorical:
+            codes, uniques = pd.factorize(df[col], use_na_sentinel=False)
+            self.codes[col] = codes
+            self.categories[col] = {_key(value): i for i, value in enumerate(uniques)}
+            self.bitsets[col] = [
+                np.packbits(codes == i) for i in range(len(uniques))
+            ]
+        self.sorted_values: Dict[str, np.ndarray] = {}
+        self.sorted_rows: Dict[str, np.ndarray] = {}
+        for col in numeric:
+            values = df[col].to_numpy(dtype=float, na_value=np.nan)
+            rows = np.flatnonzero(~np.isnan(values))
+            order = np.argsort(values[rows], kind="stable")
+            self.sorted_rows[col] = rows[order]
+            self.sorted_values[col] = values[rows][order]
+
+    def _isin(self, col: str, values: Iterable[Any]) -> np.ndarray:
+        bits = np.packbits(np.zeros(self.n_rows, dtype=bool))
+        for value in values:
+            code = self.categories[col].get(_key(value))
+            if code is not None:
+                bits |= self.bitsets[col][code]
+        return bits
+
+    def _between(self, col: str, low: float, high: float) -> np.ndarray:
+        values = self.sorted_values[col]
+        start = np.searchsorted(values, low, side="left")
+        stop = np.searchsorted(values, high, side="right")
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.sorted_rows[col][start:stop]] = True
+        return np.packbits(mask)
+
+    def mask(
+        self,
+        isin: Optional[Dict[str, Iterable[Any]]] = None,
+        between: Optional[Dict[str, Tuple[float, float]]] = None,
+    ) -> np.ndarray:
+        """Boolean row mask equivalent to ANDing isin and (inclusive) between filters"""
+        bits = np.packbits(np.ones(self.n_rows, dtype=bool))
+        for col, values in (isin or {}).items():
+            bits &= self._isin(col, values)
+        for col, (low, high) in (between or {}).items():
+            bits &= self._between(col, low, high)
+        return np.unpackbits(bits, count=self.n_rows).astype(bool)
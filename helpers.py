@@ -1,13 +1,273 @@
-from typing import List
+import time
+import tracemalloc
+from types import MappingProxyType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
+import polars as pl
 import streamlit as st
 
+from cache import LIVE_TTL, make_cache, ttl_for
 from espn_api import ESPNFantasyAPI
+from lineups import optimal_lineups
+from luck import LUCK_PROCESSES, LUCK_TABLE, season_luck
+from matchups import FACT_COLUMNS, PLAYOFF_WEEK, build_facts
+from metrics import METRICS, span, timed
+from pages.page import Page
+from warehouse import TABLES, Warehouse, decode_table, views_for
 
+# shared by every session so connections are pooled across reruns
+ESPN = ESPNFantasyAPI(cache=make_cache())
+WAREHOUSE = Warehouse()
+# the shared cache holds every payload on the host; each process memoises only a
+# few, briefly, so it picks up current season data refreshed by the warm-up worker
+MEMO_ENTRIES = 8
+# built page artifacts kept per (page, season, data version), shared by all sessions
+PAGE_STATE_ENTRIES = 32
 
-@st.experimental_memo
-def json_from_espn_api(view: str, **kwargs) -> List[dict]:
-    """Wrapper to load cached json data from ESPN's fantasy API"""
-    espn = ESPNFantasyAPI()
-    espn_json = espn.get(view=view, **kwargs)
-    return espn_json
+
+@st.cache_data(max_entries=MEMO_ENTRIES, ttl=LIVE_TTL)
+@timed("helpers.views_from_espn_api")
+def views_from_espn_api(views: List[str], **kwargs) -> Dict[str, List[dict]]:
+    """Wrapper to load several views in one request, split by view"""
+    return ESPN.get_views(views=views, **kwargs)
+
+
+@st.cache_data(max_entries=MEMO_ENTRIES, ttl=LIVE_TTL)
+@timed("helpers.jsons_from_espn_api")
+def jsons_from_espn_api(
+    fetches: Tuple[Tuple[str, Optional[int], Optional[dict]], ...],
+) -> List[List[dict]]:
+    """Wrapper to load several (view, seasonId, params) jsons concurrently"""
+    return ESPN.get_many(fetches)
+
+
+@timed("helpers.season_tables")
+def season_tables(
+    season: int, columns: Dict[str, Optional[Sequence[str]]]
+) -> Dict[str, pl.DataFrame]:
+    """
+    Load normalized tables for a season, projected to the given columns.
+    Tables come from the local parquet warehouse when ingested, otherwise
+    they are decoded from a single combined ESPN request.
+    """
+    frames = {
+        table: WAREHOUSE.read_season(table, season, columns=cols)
+        for table, cols in columns.items()
+    }
+    missing = [table for table, df in frames.items() if df is None]
+    if missing:
+        jsons = views_from_espn_api(views=views_for(missing), seasonId=season)
+        for table in missing:
+            frames[table] = decode_table(
+                table, jsons[TABLES[table].view][0], columns=columns[table]
+            )
+    return frames
+
+
+@timed("helpers.history_tables")
+def history_tables(
+    seasons: Sequence[int], columns: Dict[str, Optional[Sequence[str]]]
+) -> Dict[str, pl.DataFrame]:
+    """
+    Like season_tables across several seasons, with a season column added.
+    Seasons missing from the warehouse are fetched from ESPN concurrently.
+    """
+    missing = [
+        season
+        for season in seasons
+        if not all(WAREHOUSE.has(table, season) for table in columns)
+    ]
+    jsons = dict(
+        zip(
+            missing,
+            jsons_from_espn_api(
+                tuple((views_for(columns), season, None) for season in missing)
+            ),
+        )
+    )
+    frames = {table: [] for table in columns}
+    for season in seasons:
+        for table, cols in columns.items():
+            if season in jsons:
+                df = decode_table(table, jsons[season][0], columns=cols)
+            else:
+                df = WAREHOUSE.read_season(table, season, columns=cols)
+            frames[table].append(df.with_columns(season=pl.lit(season, pl.Int16)))
+    return {table: pl.concat(dfs) for table, dfs in frames.items()}
+
+
+def data_version(season: int, tables: Iterable[str]) -> str:
+    """
+    Changes whenever the data behind a season's tables may have: when its
+    warehouse partitions are rewritten, otherwise each time the memoised
+    ESPN payloads expire. Payloads that never expire, i.e. those of
+    completed seasons, have a single version.
+    """
+    tables = list(tables)
+    if all(WAREHOUSE.has(table, season) for table in tables):
+        mtime = max(WAREHOUSE.path(table, season).stat().st_mtime_ns for table in tables)
+        return f"warehouse:{mtime}"
+    if ttl_for(views_for(table for table in tables if table in TABLES), season) is None:
+        return "espn:final"
+    return f"espn:{int(time.time() // LIVE_TTL)}"
+
+
+@st.cache_resource(max_entries=PAGE_STATE_ENTRIES)
+def _page_state(
+    page: str, season: int, version: str, _build: Callable[[], Dict[str, Any]]
+) -> Mapping[str, Any]:
+    return MappingProxyType(_build())
+
+
+def page_state(
+    page: str, season: int, tables: Iterable[str], build: Callable[[], Dict[str, Any]]
+) -> Mapping[str, Any]:
+    """
+    Artifacts a page builds for a season, e.g. merged frames, built once per
+    data version and shared read-only by every session and rerun, so reruns
+    only redo widget-dependent work. Callers must not mutate the values.
+    """
+    with span("helpers.page_state", page=page):
+        return _page_state(page, season, data_version(season, tables), build)
+
+
+def history_version(seasons: Sequence[int], tables: Iterable[str]) -> str:
+    """Changes whenever the data_version of any of the seasons does"""
+    tables = list(tables)
+    return ",".join(data_version(season, tables) for season in seasons)
+
+
+@st.cache_data(max_entries=MEMO_ENTRIES)
+@timed("helpers.matchup_facts")
+def _matchup_facts(
+    seasons: Tuple[int, ...], playoff_week: int, version: str
+) -> pl.DataFrame:
+    return build_facts(
+        **history_tables(seasons, columns=FACT_COLUMNS),
+        playoff_week=playoff_week,
+    )
+
+
+def matchup_facts(seasons: Tuple[int, ...], playoff_week: int) -> pl.DataFrame:
+    """All-time matchup fact table, rebuilt when any season's data changes"""
+    return _matchup_facts(
+        seasons, playoff_week, history_version(seasons, FACT_COLUMNS)
+    )
+
+
+@st.cache_data(max_entries=MEMO_ENTRIES)
+@timed("helpers.schedule_luck")
+def _schedule_luck(season: int, playoff_week: int, version: str) -> pl.DataFrame:
+    return season_luck(
+        matchup_facts((season,), playoff_week), processes=LUCK_PROCESSES
+    )
+
+
+def schedule_luck(season: int, playoff_week: int) -> pl.DataFrame:
+    """
+    Simulated schedule luck for every owner in one season. Seasons that
+    warm-up or ingest simulated ahead of time are read from the warehouse;
+    others are simulated on the shared luck.process_pool when first shown
+    or when their data changes.
+    """
+    if playoff_week == PLAYOFF_WEEK:
+        stored = WAREHOUSE.read_season(LUCK_TABLE, season)
+        if stored is not None:
+            return stored
+    return _schedule_luck(
+        season, playoff_week, data_version(season, FACT_COLUMNS)
+    )
+
+
+@st.cache_data(max_entries=MEMO_ENTRIES)
+@timed("helpers.lineup_history")
+def lineup_history(seasons: Tuple[int, ...], version: str) -> pl.DataFrame:
+    """Actual and optimal points of every team-week, with team names"""
+    teams = history_tables(seasons, columns={"teams": ["id", "location", "nickname"]})
+    names = teams["teams"].select(
+        "season",
+        pl.col("id").alias("teamId"),
+        pl.concat_str("location", "nickname", separator=" ").alias("team"),
+    )
+    return optimal_lineups(
+        WAREHOUSE.read("lineups", seasons=seasons),
+        WAREHOUSE.read("lineup_slots", seasons=seasons),
+    ).join(names, on=["season", "teamId"], how="left")
+
+
+def lineup_efficiency(seasons: Sequence[int]) -> Optional[pl.DataFrame]:
+    """
+    lineup_history for the seasons whose boxscores lineups.py has ingested,
+    or None if there are none; boxscores are never fetched on page load.
+    Recomputed when those seasons' lineups or teams change.
+    """
+    loaded = tuple(
+        season
+        for season in seasons
+        if WAREHOUSE.has("lineups", season) and WAREHOUSE.has("lineup_slots", season)
+    )
+    if not loaded:
+        return None
+    tables = ["lineups", "lineup_slots", "teams"]
+    return lineup_history(loaded, history_version(loaded, tables))
+
+
+def diagnostics_panel(page: Optional[Page] = None):
+    """
+    Sidebar panel of per-stage timings, ESPN client counters, metric exports
+    and the frame memory held by the page the session is on
+    """
+    with st.sidebar:
+        st.subheader("Diagnostics")
+        if page is not None:
+            held = page.frame_bytes()
+            st.caption(
+                f"Frames held by this session: {held['session'] / 2**20:.2f} MiB, "
+                f"plus {held['shared'] / 2**20:.2f} MiB of page state shared "
+                "with other sessions"
+            )
+        if st.checkbox(
+            "Trace memory allocations",
+            value=tracemalloc.is_tracing(),
+            help="Report python allocation deltas instead of RSS. Slows the app down.",
+        ):
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+        elif tracemalloc.is_tracing():
+            tracemalloc.stop()
+        st.caption("Totals per stage since the server started")
+        st.dataframe(pl.DataFrame(METRICS.summary()), use_container_width=True)
+        st.caption("Most recent spans")
+        recent = [
+            {
+                "stage": span.stage,
+                "labels": ",".join(f"{k}={v}" for k, v in span.labels.items()),
+                "seconds": span.seconds,
+                "bytes": span.bytes,
+                "rows": span.rows,
+                "memoryDelta": span.memory_delta,
+                "error": span.error,
+            }
+            for span in reversed(METRICS.spans()[-50:])
+        ]
+        st.dataframe(pl.DataFrame(recent), use_container_width=True)
+        st.caption("ESPN client")
+        st.json({"client": dict(ESPN.stats), "cache": dict(ESPN.cache.stats)})
+        st.download_button(
+            "Prometheus metrics",
+            data=METRICS.prometheus(),
+            file_name="metrics.prom",
+            mime="text/plain",
+        )
+        if st.button("Reset metrics"):
+            METRICS.reset()
@@ -0,0 +1,83 @@
+import argparse
+import subprocess
+import sys
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from page_registry import PAGES
+
+# what app.py imports on every script run before a page module is touched
+BASE_MODULES = ["streamlit", "metrics", "page_registry", "pages.page"]
+
+
+def import_times(modules: List[str]) -> List[Tuple[str, int, int, int]]:
+    """
+    (module, depth, self us, cumulative us) for every module first imported
+    by importing modules in a fresh interpreter, in python -X importtime order
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def top_level_costs(modules: List[str]) -> Dict[str, Tuple[int, Counter]]:
+    """
+    Cumulative import time of each requested module beyond the ones before
+    it, plus the self time of the packages it pulled in
+    """
+    costs = {}
+    packages = Counter()
+    for name, depth, self_us, cumulative_us in import_times(modules):
+        packages[name.split(".")[0]] += self_us
+        if depth == 0:
+            costs[name] = (cumulative_us, packages)
+            packages = Counter()
+    return costs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Report the cold import cost of the app shell and of each page "
+        "module on top of it, measured in fresh interpreters"
+    )
+    parser.add_argument("--pages", nargs="+", default=list(PAGES), choices=list(PAGES))
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=None,
+        help="Exit non-zero if any page module costs more than this to import",
+    )
+    args = parser.parse_args()
+
+    base = top_level_costs(BASE_MODULES)
+    base_ms = sum(cumulative for cumulative, _ in base.values()) / 1000
+    print(f"{'app shell':<12}{base_ms:>9.1f} ms  ({' + '.join(BASE_MODULES)})")
+    over_budget = []
+    for page in args.pages:
+        module = PAGES[page].split(":")[0]
+        cumulative, packages = top_level_costs(BASE_MODULES + [module])[module]
+        page_ms = cumulative / 1000
+        heaviest = ", ".join(
+            f"{package} {us / 1000:.0f}" for package, us in packages.most_common(args.top)
+        )
+        print(f"{page:<12}{page_ms:>9.1f} ms  ({heaviest})")
+        if args.budget_ms is not None and page_ms > args.budget_ms:
+            over_budget.append(page)
+    if over_budget:
+        raise SystemExit(f"over the {args.budget_ms} ms budget: {', '.join(over_budget)}")
+
+
+if __name__ == "__main__":
+    main()
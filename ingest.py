@@ -0,0 +1,48 @@
+import argparse
+
+from cache import make_cache
+from espn_api import ESPNFantasyAPI
+from luck import ingest_luck
+from matchups import FACT_COLUMNS
+from pages.page import Page
+from stat_tensor import StatTensorStore, ingest_tensors
+from warehouse import TABLES, Warehouse, views_for
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load ESPN league history into the local parquet warehouse"
+    )
+    parser.add_argument("--seasons", type=int, nargs="+", default=Page().seasons)
+    parser.add_argument(
+        "--tables", nargs="+", choices=list(TABLES), default=list(TABLES)
+    )
+    args = parser.parse_args()
+
+    espn = ESPNFantasyAPI(cache=make_cache())
+    warehouse = Warehouse()
+    views = views_for(args.tables)
+    jsons = espn.get_many([(views, season, None) for season in args.seasons])
+    for season, jsn in zip(args.seasons, jsons):
+        warehouse.ingest(season, jsn[0], tables=args.tables)
+        print(f"{season}: {', '.join(args.tables)}")
+    if "player_stats" in args.tables:
+        # weekly stat lines come from their own request, see weekly_stats_filters
+        players = ingest_tensors(espn, StatTensorStore(), args.seasons)
+        for season, count in players.items():
+            print(f"{season}: stat_tensor ({count} players)")
+    if set(FACT_COLUMNS) & set(args.tables):
+        # pages read each season's schedule luck instead of simulating it
+        simulated = [
+            season
+            for season in args.seasons
+            if all(warehouse.has(table, season) for table in FACT_COLUMNS)
+        ]
+        for season, owners in ingest_luck(warehouse, simulated).items():
+            print(f"{season}: schedule_luck ({owners} owners)")
+
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
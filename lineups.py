@@ -0,0 +1,174 @@
+import argparse
+import time
+from typing import Dict, List, Sequence
+
+import numpy as np
+import polars as pl
+
+from cache import make_cache
+from decoders import AWAY_LINEUP_SCHEMA, HOME_LINEUP_SCHEMA, decode
+from enumerations import LINEUP_SLOTS
+from espn_api import ESPNFantasyAPI
+from metrics import span, timed
+from pages.page import Page
+from stat_tensor import N_PERIODS
+from warehouse import Warehouse
+
+# slots that never score: bench and injured reserve
+RESERVE_SLOTS = [slot for slot, name in LINEUP_SLOTS.items() if name in ("BE", "IR")]
+LINEUP_COLUMNS = {
+    "playerPoolEntry.appliedStatTotal": "points",
+    "playerPoolEntry.player.eligibleSlots": "eligibleSlots",
+}
+
+
+def scoring_periods(jsn: dict) -> List[int]:
+    """Scoring periods with boxscores, from an mStatus json"""
+    status = jsn.get("status") or {}
+    last = [
+        period
+        for period in (status.get("finalScoringPeriod"), status.get("latestScoringPeriod"))
+        if period
+    ]
+    return list(range(1, min(last, default=N_PERIODS) + 1))
+
+
+def decode_lineups(jsn: dict, week: int) -> pl.DataFrame:
+    """
+    Every team's roster for one scoring period of an mBoxscore json, with
+    the slots each player could fill as a bitmask (bit n for slot id n)
+    """
+    rosters = pl.concat(
+        [decode(jsn, schema) for schema in (HOME_LINEUP_SCHEMA, AWAY_LINEUP_SCHEMA)]
+    ).rename(LINEUP_COLUMNS)
+    return rosters.select(
+        pl.lit(week, pl.Int16).alias("week"),
+        "teamId",
+        "playerId",
+        "lineupSlotId",
+        pl.col("points").fill_null(0.0).cast(pl.Float32),
+        pl.col("eligibleSlots")
+        .list.unique()
+        .list.eval(pl.lit(2, pl.Int64).pow(pl.element().cast(pl.Int64)))
+        .list.sum()
+        .fill_null(0)
+        .cast(pl.Int32),
+    )
+
+
+def decode_slot_counts(jsn: dict) -> pl.DataFrame:
+    """The league's starting slots and how many of each, from an mSettings json"""
+    counts = (
+        (jsn.get("settings") or {}).get("rosterSettings", {}).get("lineupSlotCounts", {})
+    )
+    return pl.DataFrame(
+        [
+            (int(slot), count)
+            for slot, count in counts.items()
+            if count and int(slot) not in RESERVE_SLOTS
+        ],
+        schema={"lineupSlotId": pl.Int8, "count": pl.Int8},
+        orient="row",
+    )
+
+
+def ingest_lineups(
+    espn: ESPNFantasyAPI, warehouse: Warehouse, seasons: Sequence[int]
+) -> Dict[int, int]:
+    """
+    Fetch the boxscore of every scoring period of every season in one
+    concurrent batch and store each season's rosters and starting slots
+    as the lineups and lineup_slots warehouse tables. Returns roster rows
+    per season.
+    """
+    seasons = list(seasons)
+    with span("lineups.fetch_settings", seasons=str(len(seasons))):
+        settings = espn.get_many([(["mSettings", "mStatus"], s, None) for s in seasons])
+    weeks = {season: scoring_periods(jsn[0]) for season, jsn in zip(seasons, settings)}
+    fetches = [
+        ("mBoxscore", season, {"scoringPeriodId": week})
+        for season in seasons
+        for week in weeks[season]
+    ]
+    with span("lineups.fetch_boxscores", requests=str(len(fetches))):
+        boxscores = iter(espn.get_many(fetches))
+    rows = {}
+    for season, jsn in zip(seasons, settings):
+        with span("lineups.decode", season=str(season)) as decode_span:
+            lineups = pl.concat(
+                [decode_lineups(next(boxscores)[0], week) for week in weeks[season]]
+            )
+            decode_span.rows = len(lineups)
+        warehouse.write("lineups", season, lineups)
+        warehouse.write("lineup_slots", season, decode_slot_counts(jsn[0]))
+        rows[season] = len(lineups)
+    return rows
+
+
+@timed("lineups.optimal_lineups", rows=lambda result, *_: len(result))
+def optimal_lineups(lineups: pl.DataFrame, slots: pl.DataFrame) -> pl.DataFrame:
+    """
+    Actual and optimal starting points of every team-week in the lineups
+    and lineup_slots tables (with a season column). The optimal lineup
+    fills the most restrictive slots first, e.g. QB before FLEX before OP,
+    with the best players still unused, which is exact when eligibility is
+    nested as in standard leagues. Each slot type is one vectorized pass
+    over every team-week: rows are sorted by points within their team-week,
+    so a player's rank among the eligible unused players is a cumulative
+    count minus the count at the start of the team-week.
+    """
+    keys = ["season", "week", "teamId"]
+    df = lineups.sort(keys + ["points"], descending=[False, False, False, True])
+    group = df.select(pl.struct(keys).rle_id()).to_series().to_numpy()
+    starts = np.flatnonzero(np.diff(group, prepend=-1))
+    points = df["points"].to_numpy().astype(np.float64)
+    eligible = df["eligibleSlots"].to_numpy()
+    fits = {
+        slot: (eligible >> slot) & 1 == 1
+        for slot in slots["lineupSlotId"].unique().to_list()
+    }
+    used = np.zeros(len(df), dtype=bool)
+    for slot in sorted(fits, key=lambda slot: fits[slot].sum()):
+        counts = dict(
+            slots.filter(pl.col("lineupSlotId") == slot).select("season", "count").iter_rows()
+        )
+        count = df["season"].replace_strict(counts, default=0).to_numpy()
+        candidate = fits[slot] & ~used
+        taken = np.cumsum(candidate)
+        rank = taken - (taken - candidate)[starts][group] - 1
+        used |= candidate & (rank < count)
+    starting = ~np.isin(df["lineupSlotId"].to_numpy(), RESERVE_SLOTS)
+    actual = np.bincount(group, weights=points * starting, minlength=len(starts))
+    optimal = np.bincount(group, weights=points * used, minlength=len(starts))
+    # the actual lineup was legal, so it bounds the greedy fill from below
+    optimal = np.maximum(optimal, actual)
+    return (
+        df[starts]
+        .select(keys)
+        .with_columns(
+            actualPoints=pl.Series(actual, dtype=pl.Float32),
+            optimalPoints=pl.Series(optimal, dtype=pl.Float32),
+        )
+        .with_columns(
+            benchPoints=pl.col("optimalPoints") - pl.col("actualPoints"),
+            efficiency=pl.col("actualPoints") / pl.col("optimalPoints"),
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load every week's boxscore into the warehouse lineups table"
+    )
+    parser.add_argument("--seasons", type=int, nargs="+", default=Page().seasons)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = ingest_lineups(ESPNFantasyAPI(cache=make_cache()), Warehouse(), args.seasons)
+    for season, count in rows.items():
+        print(f"{season}: {count} roster rows")
+    print(f"ok ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
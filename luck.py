@@ -0,0 +1,284 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import polars as pl
+
+from matchups import FACT_COLUMNS, PLAYOFF_WEEK, build_facts
+from metrics import span
+from warehouse import Warehouse
+
+N_SIMS = 1_000_000
+BATCH_SIZE = 50_000
+PERCENTILES = (5, 25, 50, 75, 95)
+# columns of season_luck, also returned when no season has decided games
+LUCK_SCHEMA = {
+    "season": pl.Int16,
+    "owner": pl.String,
+    "allPlayWins": pl.Float64,
+    "expectedWins": pl.Float64,
+    "simulatedMean": pl.Float64,
+    **{f"p{q}": pl.Float64 for q in PERCENTILES},
+    "wins": pl.Float64,
+    "winsAboveExpected": pl.Float64,
+}
+# warehouse table of season_luck for seasons simulated ahead of time
+LUCK_TABLE = "schedule_luck"
+# processes simulating a season's schedule luck
+LUCK_PROCESSES = min(4, os.cpu_count() or 1)
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def points_matrix(facts: pl.DataFrame) -> Tuple[List[str], np.ndarray]:
+    """Owners and their (owners x weeks) regular season points from one season of facts"""
+    wide = (
+        facts.filter(pl.col("type") == "Regular")
+        .pivot(on="week", index="owner", values="pointsFor", sort_columns=True)
+        .sort("owner")
+    )
+    weeks = sorted(wide.columns[1:], key=int)
+    return wide["owner"].to_list(), wide.select(weeks).to_numpy().astype(np.float64)
+
+
+def all_play(points: np.ndarray) -> np.ndarray:
+    """
+    Wins each team would have by playing every other team every week, ties
+    counting half. See expected_wins for the wins of a random schedule.
+    """
+    scores = points.T[:, :, None]  # weeks x teams x 1
+    others = points.T[:, None, :]  # weeks x 1 x teams
+    wins = (scores > others).sum(axis=(0, 2)) + 0.5 * (scores == others).sum(
+        axis=(0, 2)
+    )
+    # a team always ties itself
+    return wins - 0.5 * np.isfinite(points).sum(axis=1)
+
+
+def expected_wins(all_play_wins: np.ndarray, n_teams: int) -> np.ndarray:
+    """
+    Mean wins over random schedules: each game is against a uniformly random
+    other team, and with an odd count a team has a bye one week in n_teams,
+    so it plays (n_teams - 1) / n_teams games a week
+    """
+    return all_play_wins / (n_teams - 1 + n_teams % 2)
+
+
+# above this many teams the table of every weekly pairing gets too large
+MAX_MATCHING_TEAMS = 14
+
+
+def _pairings(slots: Tuple[int, ...]) -> Iterator[List[Tuple[int, int]]]:
+    if not slots:
+        yield []
+        return
+    first, rest = slots[0], slots[1:]
+    for i, other in enumerate(rest):
+        for pairs in _pairings(rest[:i] + rest[i + 1 :]):
+            yield [(first, other)] + pairs
+
+
+def matchings(n_teams: int) -> np.ndarray:
+    """
+    Every way to pair off n_teams for a week as an (n_matchings x n_teams)
+    array of opponents; with an odd count one team gets a bye (opponent n_teams)
+    """
+    n_slots = n_teams + n_teams % 2
+    pairings = list(_pairings(tuple(range(n_slots))))
+    opponents = np.empty((len(pairings), n_slots), dtype=np.int16)
+    for i, pairs in enumerate(pairings):
+        for a, b in pairs:
+            opponents[i, a], opponents[i, b] = b, a
+    return opponents[:, :n_teams]
+
+
+def _half_wins(points: np.ndarray, opponents: np.ndarray) -> np.ndarray:
+    """Half wins per team for each week and matching: (weeks x matchings x teams)"""
+    # an extra NaN row scores the bye opponent, which nobody beats or loses to
+    padded = np.vstack([points, np.full(points.shape[1], np.nan)]).T
+    scores = padded[:, None, : points.shape[0]]
+    opponent_scores = padded[:, opponents]
+    return (2 * (scores > opponent_scores) + (scores == opponent_scores)).astype(
+        np.int8
+    )
+
+
+def _simulate(points: np.ndarray, n_sims: int, batch_size: int, seed) -> np.ndarray:
+    """Histogram (teams x half-wins) of win totals over random schedules"""
+    rng = np.random.default_rng(seed)
+    n_teams, n_weeks = points.shape
+    counts = np.zeros((n_teams, 2 * n_weeks + 1), dtype=np.int64)
+    offsets = np.arange(n_teams) * (2 * n_weeks + 1)
+    weeks = np.arange(n_weeks)
+    if n_teams <= MAX_MATCHING_TEAMS:
+        # a uniformly random matching per week, looked up from precomputed results
+        table = _half_wins(points, matchings(n_teams))
+        n_matchings = table.shape[1]
+    else:
+        teams = np.arange(n_teams, dtype=np.int16)
+        n_pairs = n_teams // 2
+    done = 0
+    while done < n_sims:
+        size = min(batch_size, n_sims - done)
+        if n_teams <= MAX_MATCHING_TEAMS:
+            picks = rng.integers(n_matchings, size=(size, n_weeks))
+            half_wins = table[weeks, picks].sum(axis=1, dtype=np.int64)
+        else:
+            # shuffle each week's teams and pair them off consecutively
+            order = rng.permuted(np.tile(teams, (size * n_weeks, 1)), axis=1)
+            order = order.reshape(size, n_weeks, n_teams)
+            home = order[:, :, 0 : 2 * n_pairs : 2]
+            away = order[:, :, 1 : 2 * n_pairs : 2]
+            home_pts = points[home, weeks[None, :, None]]
+            away_pts = points[away, weeks[None, :, None]]
+            home_half = 2 * (home_pts > away_pts) + (home_pts == away_pts)
+            away_half = 2 - home_half - 2 * np.isnan(home_pts + away_pts)
+            # every team plays at most once a week, so results scatter without collisions
+            results = np.zeros((size, n_weeks, n_teams), dtype=np.int8)
+            np.put_along_axis(results, home, home_half.astype(np.int8), axis=2)
+            np.put_along_axis(results, away, away_half.astype(np.int8), axis=2)
+            half_wins = results.sum(axis=1, dtype=np.int64)
+        counts += np.bincount(
+            (half_wins + offsets).ravel(), minlength=counts.size
+        ).reshape(counts.shape)
+        done += size
+    return counts
+
+
+def process_pool(processes: int) -> ProcessPoolExecutor:
+    """
+    A pool of the given size kept for the life of the process and shared by
+    every caller. Workers are spawned rather than forked, since forking a
+    multi-threaded server such as Streamlit's can deadlock.
+    """
+    with _pools_lock:
+        if processes not in _pools:
+            _pools[processes] = ProcessPoolExecutor(
+                max_workers=processes, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pools[processes]
+
+
+def simulate(
+    points: np.ndarray,
+    n_sims: int = N_SIMS,
+    batch_size: int = BATCH_SIZE,
+    seed: Optional[int] = None,
+    processes: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Play n_sims random schedules against the actual weekly scores and return
+    a (teams x 2 * weeks + 1) histogram of each team's win totals in half
+    wins. With processes > 1 the simulations are split over process_pool.
+    """
+    if not processes or processes < 2:
+        return _simulate(points, n_sims, batch_size, seed)
+    seeds = np.random.SeedSequence(seed).spawn(processes)
+    sizes = [n_sims // processes + (i < n_sims % processes) for i in range(processes)]
+    try:
+        return sum(
+            process_pool(processes).map(
+                _simulate,
+                [points] * processes,
+                sizes,
+                [batch_size] * processes,
+                seeds,
+            )
+        )
+    except BrokenProcessPool:
+        # a worker died; the next call starts a new pool instead of failing too
+        with _pools_lock:
+            _pools.pop(processes, None)
+        raise
+
+
+def _percentiles(counts: np.ndarray) -> np.ndarray:
+    cdf = counts.cumsum(axis=1) / counts.sum(axis=1, keepdims=True)
+    return np.stack([(cdf < q / 100).sum(axis=1) / 2 for q in PERCENTILES], axis=1)
+
+
+def season_luck(
+    facts: pl.DataFrame,
+    n_sims: int = N_SIMS,
+    seed: Optional[int] = None,
+    processes: Optional[int] = None,
+) -> pl.DataFrame:
+    """
+    Actual, all-play expected and simulated regular season wins for every
+    owner and season in facts (see matchups.build_facts). Seasons without
+    decided regular season games are left out.
+    """
+    frames = []
+    for (season,), season_facts in facts.partition_by(
+        "season", as_dict=True, maintain_order=True
+    ).items():
+        if season_facts.filter(pl.col("type") == "Regular").is_empty():
+            continue
+        owners, points = points_matrix(season_facts)
+        n_teams = len(owners)
+        counts = simulate(points, n_sims=n_sims, seed=seed, processes=processes)
+        half_wins = np.arange(counts.shape[1])
+        actual = (
+            season_facts.filter(pl.col("type") == "Regular")
+            .group_by("owner")
+            .agg(pl.col("win").sum().alias("wins"))
+        )
+        all_play_wins = all_play(points)
+        frames.append(
+            pl.DataFrame(
+                {
+                    "season": season,
+                    "owner": owners,
+                    "allPlayWins": all_play_wins,
+                    "expectedWins": expected_wins(all_play_wins, n_teams),
+                    "simulatedMean": (counts * half_wins).sum(axis=1)
+                    / counts.sum(axis=1)
+                    / 2,
+                    **{
+                        f"p{q}": column
+                        for q, column in zip(PERCENTILES, _percentiles(counts).T)
+                    },
+                }
+            )
+            .join(actual, on="owner", how="left")
+            .with_columns(winsAboveExpected=pl.col("wins") - pl.col("expectedWins"))
+        )
+    if not frames:
+        return pl.DataFrame(schema=LUCK_SCHEMA)
+    return pl.concat(frames).with_columns(pl.col("season").cast(pl.Int16))
+
+
+def ingest_luck(
+    warehouse: Warehouse,
+    seasons: Iterable[int],
+    playoff_week: int = PLAYOFF_WEEK,
+    processes: Optional[int] = LUCK_PROCESSES,
+) -> Dict[int, int]:
+    """
+    Simulate the schedule luck of each season from its warehouse tables and
+    store it as the LUCK_TABLE warehouse table, so pages read it instead of
+    simulating. Returns owner rows per season.
+    """
+    rows = {}
+    for season in seasons:
+        with span("luck.ingest", season=str(season)):
+            facts = build_facts(
+                **{
+                    table: warehouse.read(
+                        table,
+                        seasons=[season],
+                        columns=None if columns is None else [*columns, "season"],
+                    )
+                    for table, columns in FACT_COLUMNS.items()
+                },
+                playoff_week=playoff_week,
+            )
+            luck = season_luck(facts, processes=processes)
+        warehouse.write(LUCK_TABLE, season, luck)
+        rows[season] = len(luck)
+    return rows
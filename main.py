@@ -3,12 +3,26 @@ from pydantic import BaseModel
 import requests
 import json
 
+from decoders import PLAYER_SCHEMA, STAT_SCHEMA, decode
+from player_stats import PROJECTED, SEASON as SEASON_SPLIT
+from snapshots import SnapshotStore
+
+SEASON = 2025
 FILTERS = {
     "players": {
         "limit": 10000,
         "sortDraftRanks": {"sortPriority": 100, "sortAsc": True, "value": "PPR"},
     }
 }
+COLUMNS = {
+    "id": "player_id",
+    "player.fullName": "player_name",
+    "player.defaultPositionId": "position",
+    "player.ownership.auctionValueAverage": "average_auction_value",
+    "player.ownership.averageDraftPosition": "average_draft_position",
+    "player.ownership.percentOwned": "percent_owned",
+    "player.injured": "injured",
+}
 HEADERS = {
     "Accept": "application/json",
     "Accept-Encoding": "gzip, deflate, br, zstd",
@@ -22,26 +36,34 @@ HEADERS = {
 
 def main():
     response = requests.get(
-        url="https://lm-api-reads.fantasy.espn.com/apis/v3/games/ffl/seasons/2025/segments/0/leaguedefaults/3?view=kona_player_info",
+        url=f"https://lm-api-reads.fantasy.espn.com/apis/v3/games/ffl/seasons/{SEASON}/segments/0/leaguedefaults/3?view=kona_player_info",
         headers=HEADERS,
     )
     jsn = response.json()
-    players_list = []
-    for players in jsn["players"]:
-        player = players["player"]
-        ownership = player.get("ownership", {})
-        player_data = {
-            "player_id": player.get("id"),
-            "player_name": player.get("fullName"),
-            "position": player.get("defaultPositionId"),
-            "average_auction_value": ownership.get("auctionValueAverage"),
-            "average_draft_position": ownership.get("averageDraftPosition"),
-            "percent_owned": ownership.get("percentOwned"),
-            "injured": player.get("injured"),
-        }
-        players_list.append(player_data)
-    df = pl.DataFrame(players_list).sort("average_draft_position")
+    # season projections, the value auction.py optimizes
+    projections = (
+        decode(jsn, STAT_SCHEMA)
+        .filter(
+            (pl.col("statSourceId") == PROJECTED)
+            & (pl.col("statSplitTypeId") == SEASON_SPLIT)
+            & (pl.col("seasonId") == SEASON)
+        )
+        .unique("playerId", keep="last")
+        .select(
+            pl.col("playerId").alias("id"),
+            pl.col("appliedTotal").alias("projected_points"),
+        )
+    )
+    df = (
+        decode(jsn, PLAYER_SCHEMA, columns=list(COLUMNS))
+        .join(projections, on="id", how="left")
+        .rename(COLUMNS)
+        .sort("average_draft_position")
+    )
     df.write_csv("espn_auction_ranks.csv")
+    # keep the preseason history the csv overwrites
+    changed = SnapshotStore().append(SEASON, df)
+    print(f"{changed} of {len(df)} players changed since the last snapshot")
 
     print("ok")
 
@@ -0,0 +1,174 @@
+from typing import Optional
+
+import polars as pl
+from polars.dataframe.group_by import GroupBy
+
+PLAYOFF_WEEK = 14
+# warehouse columns build_facts reads from each table
+FACT_COLUMNS = {
+    "schedule": [
+        "matchupPeriodId",
+        "winner",
+        "home.teamId",
+        "home.totalPoints",
+        "away.teamId",
+        "away.totalPoints",
+    ],
+    "teams": ["id", "location", "nickname", "primaryOwner"],
+    "members": None,
+}
+
+
+def build_facts(
+    schedule: pl.DataFrame,
+    teams: pl.DataFrame,
+    members: pl.DataFrame,
+    playoff_week: int = PLAYOFF_WEEK,
+) -> pl.DataFrame:
+    """
+    One row per team per played game across every season in the inputs,
+    keyed by the team's primary owner so history survives team renames.
+    Inputs are the warehouse schedule, teams and members tables with a
+    season column.
+    """
+    owners = members.unique("id").select(
+        pl.col("id").alias("ownerId"),
+        pl.when(pl.col("firstName").is_not_null())
+        .then(pl.concat_str("firstName", "lastName", separator=" "))
+        .otherwise(pl.col("displayName"))
+        .alias("owner"),
+    )
+    team_owners = (
+        teams.select(
+            "season",
+            pl.col("id").alias("teamId"),
+            pl.concat_str("location", "nickname", separator=" ").alias("team"),
+            pl.col("primaryOwner").alias("ownerId"),
+        )
+        .join(owners, on="ownerId", how="left")
+        .with_columns(pl.col("owner").fill_null(pl.col("team")))
+    )
+    games = schedule.filter(
+        pl.col("away.teamId").is_not_null() & (pl.col("winner") != "UNDECIDED")
+    )
+    sides = []
+    for side, other in [("home", "away"), ("away", "home")]:
+        sides.append(
+            games.select(
+                "season",
+                pl.col("matchupPeriodId").alias("week"),
+                pl.col(f"{side}.teamId").alias("teamId"),
+                pl.col(f"{other}.teamId").alias("opponentTeamId"),
+                pl.col(f"{side}.totalPoints").alias("pointsFor"),
+                pl.col(f"{other}.totalPoints").alias("pointsAgainst"),
+            )
+        )
+    opponents = team_owners.rename(
+        {
+            "teamId": "opponentTeamId",
+            "team": "opponentTeam",
+            "ownerId": "opponentOwnerId",
+            "owner": "opponent",
+        }
+    )
+    return (
+        pl.concat(sides)
+        .join(team_owners, on=["season", "teamId"], how="left")
+        .join(opponents, on=["season", "opponentTeamId"], how="left")
+        .with_columns(
+            margin=pl.col("pointsFor") - pl.col("pointsAgainst"),
+            type=pl.when(pl.col("week") >= playoff_week)
+            .then(pl.lit("Playoff"))
+            .otherwise(pl.lit("Regular")),
+        )
+        .with_columns(
+            win=pl.when(pl.col("margin") > 0)
+            .then(1.0)
+            .when(pl.col("margin") < 0)
+            .then(0.0)
+            .otherwise(0.5)
+        )
+        .sort("season", "week", "ownerId")
+    )
+
+
+def select_games(
+    facts: pl.DataFrame,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    game_type: Optional[str] = None,
+) -> pl.DataFrame:
+    """Restrict facts to a season range and optionally Regular or Playoff games"""
+    if since is not None:
+        facts = facts.filter(pl.col("season") >= since)
+    if until is not None:
+        facts = facts.filter(pl.col("season") <= until)
+    if game_type is not None:
+        facts = facts.filter(pl.col("type") == game_type)
+    return facts
+
+
+def _record(by: GroupBy) -> pl.DataFrame:
+    return by.agg(
+        pl.len().alias("games"),
+        (pl.col("win") == 1).sum().alias("wins"),
+        (pl.col("win") == 0).sum().alias("losses"),
+        (pl.col("win") == 0.5).sum().alias("ties"),
+        pl.col("pointsFor").sum(),
+        pl.col("pointsAgainst").sum(),
+    ).with_columns(winPct=(pl.col("wins") + 0.5 * pl.col("ties")) / pl.col("games"))
+
+
+def owner_totals(facts: pl.DataFrame) -> pl.DataFrame:
+    """All-time record and points for/against per owner"""
+    return _record(facts.group_by("ownerId", "owner")).sort("winPct", descending=True)
+
+
+def head_to_head(facts: pl.DataFrame) -> pl.DataFrame:
+    """Record and points for every (owner, opponent) pair"""
+    return _record(facts.group_by("owner", "opponent")).sort("owner", "opponent")
+
+
+def win_matrix(facts: pl.DataFrame, value: str = "wins") -> pl.DataFrame:
+    """Owner x opponent matrix of a head_to_head column, e.g. wins or pointsFor"""
+    return (
+        head_to_head(facts)
+        .pivot(on="opponent", index="owner", values=value, sort_columns=True)
+        .sort("owner")
+    )
+
+
+def rivalry(
+    facts: pl.DataFrame, owner: str, opponent: str, since: Optional[int] = None
+) -> pl.DataFrame:
+    """Every game between two owners, e.g. rivalry(facts, "A", "B", since=2016)"""
+    return select_games(facts, since=since).filter(
+        (pl.col("owner") == owner) & (pl.col("opponent") == opponent)
+    )
+
+
+def streaks(facts: pl.DataFrame) -> pl.DataFrame:
+    """Longest win and loss streaks plus the current streak for each owner"""
+    runs = (
+        facts.sort("ownerId", "season", "week")
+        .with_columns(run=pl.col("win").rle_id().over("ownerId"))
+        .group_by("ownerId", "owner", "run", maintain_order=True)
+        .agg(pl.col("win").first(), pl.len().cast(pl.Int32).alias("length"))
+    )
+    return (
+        runs.group_by("ownerId", "owner", maintain_order=True)
+        .agg(
+            pl.col("length").filter(pl.col("win") == 1).max().alias("longestWinStreak"),
+            pl.col("length")
+            .filter(pl.col("win") == 0)
+            .max()
+            .alias("longestLossStreak"),
+            pl.when(pl.col("win").last() == 1)
+            .then(pl.col("length").last())
+            .when(pl.col("win").last() == 0)
+            .then(-pl.col("length").last())
+            .otherwise(0)
+            .alias("currentStreak"),
+        )
+        .fill_null(0)
+    )
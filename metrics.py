@@ -0,0 +1,212 @@
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+METRICS_LOG = os.environ.get("ESPN_METRICS_LOG")  # json lines file, one per span
+# seconds, roughly log spaced from a cache hit up to a slow ESPN round trip
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RECENT_SPANS = 500
+
+logger = logging.getLogger("espn.metrics")
+
+
+def memory_bytes() -> Optional[int]:
+    """
+    Traced python allocations while tracemalloc is running, otherwise the
+    resident set size where /proc is available
+    """
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def count_rows(result: Any) -> Optional[int]:
+    """Rows in a frame or list, summed over dict values such as a dict of tables"""
+    if isinstance(result, dict):
+        counts = [count_rows(value) for value in result.values()]
+        return sum(c for c in counts if c is not None) if counts else None
+    if isinstance(result, (list, tuple)) or hasattr(result, "shape"):
+        return len(result)
+    return None
+
+
+@dataclass
+class Span:
+    stage: str
+    labels: Dict[str, str] = field(default_factory=dict)
+    started: float = 0.0
+    seconds: float = 0.0
+    bytes: int = 0
+    rows: Optional[int] = None
+    memory_delta: Optional[int] = None
+    error: Optional[str] = None
+
+
+class Metrics:
+    """
+    Thread-safe recorder of timed spans. Keeps the most recent spans plus
+    running counters and a latency histogram per (stage, labels), which can
+    be exported in Prometheus text format.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS, recent: int = RECENT_SPANS):
+        self.buckets = buckets
+        self.recent: deque = deque(maxlen=recent)
+        self._series: Dict[Tuple[str, Tuple], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage: str, **labels: str) -> Iterator[Span]:
+        """
+        Time the enclosed block; set span.bytes or span.rows inside it to
+        record payload size and rows processed
+        """
+        span = Span(stage=stage, labels=labels, started=time.time())
+        memory = memory_bytes()
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.seconds = time.perf_counter() - start
+            after = memory_bytes()
+            if memory is not None and after is not None:
+                span.memory_delta = after - memory
+            self.record(span)
+
+    def timed(
+        self, stage: str, rows: Optional[Callable[..., Optional[int]]] = None
+    ) -> Callable:
+        """
+        Decorator recording a span per call. Rows are counted from the return
+        value, or by rows(result, *args) for methods that return None.
+        """
+
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(stage) as span:
+                    result = func(*args, **kwargs)
+                    span.rows = rows(result, *args) if rows else count_rows(result)
+                return result
+
+            return wrapper
+
+        return decorator
+
+    def record(self, span: Span):
+        key = (span.stage, tuple(sorted(span.labels.items())))
+        with self._lock:
+            self.recent.append(span)
+            series = self._series.setdefault(
+                key,
+                {
+                    "calls": 0,
+                    "errors": 0,
+                    "seconds": 0.0,
+                    "bytes": 0,
+                    "rows": 0,
+                    "buckets": [0] * len(self.buckets),
+                },
+            )
+            series["calls"] += 1
+            series["errors"] += span.error is not None
+            series["seconds"] += span.seconds
+            series["bytes"] += span.bytes
+            series["rows"] += span.rows or 0
+            index = bisect.bisect_left(self.buckets, span.seconds)
+            if index < len(self.buckets):
+                series["buckets"][index] += 1
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(asdict(span)))
+
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self.recent)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Totals per stage and labels, slowest total first"""
+        with self._lock:
+            rows = [
+                {
+                    "stage": stage,
+                    **dict(labels),
+                    "calls": s["calls"],
+                    "errors": s["errors"],
+                    "totalSeconds": s["seconds"],
+                    "meanSeconds": s["seconds"] / s["calls"],
+                    "bytes": s["bytes"],
+                    "rows": s["rows"],
+                }
+                for (stage, labels), s in self._series.items()
+            ]
+        return sorted(rows, key=lambda row: row["totalSeconds"], reverse=True)
+
+    def prometheus(self, prefix: str = "espn_stage") -> str:
+        """Counters and a latency histogram per stage in Prometheus text format"""
+        with self._lock:
+            series = [
+                (key, {**s, "buckets": list(s["buckets"])})
+                for key, s in self._series.items()
+            ]
+        lines = []
+        for name, kind, help_text in [
+            ("calls_total", "counter", "Spans recorded"),
+            ("errors_total", "counter", "Spans that raised"),
+            ("bytes_total", "counter", "Payload bytes downloaded"),
+            ("rows_total", "counter", "Rows processed"),
+            ("seconds", "histogram", "Wall time per span"),
+        ]:
+            lines += [
+                f"# HELP {prefix}_{name} {help_text}",
+                f"# TYPE {prefix}_{name} {kind}",
+            ]
+            for (stage, labels), s in series:
+                label_text = ",".join(
+                    f'{k}="{v}"' for k, v in (("stage", stage),) + labels
+                )
+                if kind == "counter":
+                    value = s[name[: -len("_total")]]
+                    lines.append(f"{prefix}_{name}{{{label_text}}} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets, s["buckets"]):
+                    cumulative += count
+                    lines.append(
+                        f'{prefix}_{name}_bucket{{{label_text},le="{bound}"}} {cumulative}'
+                    )
+                lines += [
+                    f'{prefix}_{name}_bucket{{{label_text},le="+Inf"}} {s["calls"]}',
+                    f"{prefix}_{name}_sum{{{label_text}}} {s['seconds']}",
+                    f"{prefix}_{name}_count{{{label_text}}} {s['calls']}",
+                ]
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.recent.clear()
+            self._series.clear()
+
+
+METRICS = Metrics()
+span = METRICS.span
+timed = METRICS.timed
+
+if METRICS_LOG:
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.FileHandler(METRICS_LOG))
@@ -0,0 +1,48 @@
+import importlib
+import sys
+from typing import Dict, List, Optional, Type
+
+from metrics import span
+from pages.page import Page
+
+# page name -> "module:class", imported only when the page is first opened
+PAGES: Dict[str, str] = {
+    "Draft": "pages.draft:DraftPage",
+    "Matchups": "pages.matchup:MatchupPage",
+}
+# warehouse columns each page reads per table (None for all), kept here so the
+# warm-up worker knows the pages' requests without importing them
+TABLE_COLUMNS: Dict[str, Dict[str, Optional[List[str]]]] = {
+    "Draft": {
+        "players": [
+            "id",
+            "player.fullName",
+            "player.defaultPositionId",
+            "player.proTeamId",
+        ],
+        "picks": ["playerId", "teamId", "bidAmount", "keeper"],
+        "teams": ["id", "location", "nickname"],
+        "player_stats": None,
+    },
+    "Matchups": {
+        "schedule": [
+            "matchupPeriodId",
+            "home.teamId",
+            "home.totalPoints",
+            "away.teamId",
+            "away.totalPoints",
+        ],
+        "teams": ["id", "location", "nickname"],
+    },
+}
+
+
+def load_page(name: str) -> Type[Page]:
+    """Import a page's module on first use and return its Page class"""
+    module_name, class_name = PAGES[name].split(":")
+    if module_name in sys.modules:
+        module = sys.modules[module_name]
+    else:
+        with span("page.import", page=name):
+            module = importlib.import_module(module_name)
+    return getattr(module, class_name)
@@ -2,22 +2,32 @@ from typing import *
 
 import numpy as np
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
+import polars as pl
 import streamlit as st
-from sklearn.linear_model import LinearRegression
 
-from enumerations import POSITIONS, TEAMS
-from helpers import json_from_espn_api
+from charts import sample_points, scatter_type
+from compact import POSITION_CODES, TEAM_CODES, compact
+from filter_index import FilterIndex
+from helpers import page_state, season_tables
+from metrics import timed
+from page_registry import TABLE_COLUMNS
 from pages.page import Page
+from player_stats import season_stats
 
 
-def get_season_avg(row, year: int):
-    avg = None
-    for stat_dict in row["player.stats"]:
-        if stat_dict.get("id") == f"00{str(year)}":
-            avg = stat_dict.get(f"appliedAverage")
-    return avg
+KEEPER_COLORS = {True: "red", False: "blue"}
+# everything the page filters, plots or hovers; the merge keys are dropped
+DRAFT_COLUMNS = [
+    "playerId",
+    "player.fullName",
+    "Position",
+    "Team",
+    "Drafter",
+    "keeper",
+    "bidAmount",
+    "seasonAverage",
+]
 
 
 def get_unique_vals(vals, add_all: bool = True):
@@ -25,14 +35,72 @@ def get_unique_vals(vals, add_all: bool = True):
     return vals.unique().tolist() + all_list
 
 
+def build_filter_index(df: pd.DataFrame) -> FilterIndex:
+    return FilterIndex(
+        df,
+        categorical=["Position", "Team", "Drafter", "keeper"],
+        numeric=["seasonAverage", "bidAmount"],
+    )
+
+
+@st.cache_data
+def fit_value_line(
+    bid_amount: np.ndarray, season_average: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fit season average against bid amount through the origin. Cached per
+    season's data, so sklearn is only imported when a new fit is needed.
+    """
+    from sklearn.linear_model import LinearRegression
+
+    lr = LinearRegression(fit_intercept=False)
+    lr.fit(bid_amount.reshape(-1, 1), season_average)
+    reg_x = np.linspace(-5, bid_amount.max() + 5)
+    return reg_x, lr.predict(reg_x.reshape(-1, 1))
+
+
+@st.cache_resource
+def value_scatter_base(
+    reg_x: np.ndarray,
+    reg_y: np.ndarray,
+    x_range: Tuple[float, float],
+    y_range: Tuple[float, float],
+) -> go.Figure:
+    """Regression line and layout shared by every filter of a season; do not mutate"""
+    fig = go.Figure(
+        go.Scatter(
+            x=reg_x,
+            y=reg_y,
+            mode="lines",
+            line=dict(color="black", dash="dash"),
+            hoverinfo="skip",
+            showlegend=False,
+        )
+    )
+    axes_kwargs = dict(zeroline=True, zerolinewidth=1, zerolinecolor="black")
+    fig.update_xaxes(range=list(x_range), **axes_kwargs)
+    fig.update_yaxes(range=list(y_range), **axes_kwargs)
+    fig.update_layout(
+        title_text="Season Averages vs. Auction Amount",
+        title_x=0.5,
+        xaxis_title="Bid Amount",
+        yaxis_title="Season Scoring Average",
+        legend_title_text="keeper",
+        height=600,
+    )
+    return fig
+
+
 class DraftPage(Page):
+    table_columns = TABLE_COLUMNS["Draft"]
+
     def __init__(self):
         super().__init__()
         self.season: Optional[int] = None
-        self.player_json: Optional[List[dict]] = None
-        self.draft_json: Optional[List[dict]] = None
-        self.team_json: Optional[List[dict]] = None
+        self.tables: Optional[Dict[str, pl.DataFrame]] = None
         self.df: Optional[pd.DataFrame] = None
+        self.filter_index: Optional[FilterIndex] = None
+        self.plot_df: Optional[pd.DataFrame] = None
         self.positions: Optional[List[str]] = None
         self.teams: Optional[List[str]] = None
         self.drafters: Optional[List[str]] = None
@@ -45,19 +113,11 @@ class DraftPage(Page):
         self.season = st.selectbox(
             label="Season:", options=self.seasons, index=len(self.seasons) - 1
         )
-        self.player_json = json_from_espn_api(
-            view="kona_player_info", seasonId=self.season
+        self.state = page_state(
+            "draft", self.season, self.table_columns, self.build_state
         )
+        self.df, self.filter_index = self.state["df"], self.state["filter_index"]
         st.header("League Trends")
-        player_df = pd.json_normalize(self.player_json[0]["players"])
-        self.draft_json = json_from_espn_api(view="mDraftDetail", seasonId=self.season)
-        draft_df = pd.json_normalize(self.draft_json[0]["draftDetail"]["picks"])
-        self.team_json = json_from_espn_api(view="mTeam", seasonId=self.season)
-        team_df = pd.json_normalize(self.team_json[0]["teams"])
-        self.df = draft_df.merge(
-            player_df, how="left", left_on="playerId", right_on="id"
-        ).merge(team_df, how="left", left_on="teamId", right_on="id")
-        self._add_columns()
         # st.dataframe(self.df)
         # st.dataframe(player_df)
         # st.dataframe(draft_df)
@@ -107,79 +167,90 @@ class DraftPage(Page):
             self.bid_amount = st.slider(
                 "Bid Amount", value=(0, int(self.df["bidAmount"].max()))
             )
-        self._filter_df()
+        self.plot_df = self._filter_df()
         with plot_col:
             self._plot_value_scatter()
         st.header("Team Value")
 
+    def build_state(self) -> Dict[str, Any]:
+        """Season artifacts shared by every rerun; see helpers.page_state"""
+        self.tables = season_tables(self.season, columns=self.table_columns)
+        self.build_df()
+        self._add_columns()
+        self.df = compact(self.df, columns=DRAFT_COLUMNS, categorical=["Drafter"])
+        return {"df": self.df, "filter_index": build_filter_index(self.df)}
+
+    @timed("draft.build_df", rows=lambda _, page: len(page.df))
+    def build_df(self):
+        player_df = self.tables["players"].to_pandas()
+        draft_df = self.tables["picks"].to_pandas()
+        team_df = self.tables["teams"].to_pandas()
+        self.df = draft_df.merge(
+            player_df, how="left", left_on="playerId", right_on="id"
+        ).merge(team_df, how="left", left_on="teamId", right_on="id")
 
+    @timed("draft.add_columns", rows=lambda _, page: len(page.df))
     def _add_columns(self):
-        self.df["seasonAverage"] = self.df.apply(
-            lambda x: get_season_avg(x, self.season), axis=1
+        stats_df = season_stats(self.tables["player_stats"], self.season).to_pandas()
+        self.df = self.df.merge(
+            stats_df[["playerId", "seasonAverage"]], how="left", on="playerId"
         )
         self.df["Drafter"] = self.df["location"] + " " + self.df["nickname"]
-        self.df["Position"] = self.df["player.defaultPositionId"].map(POSITIONS)
-        self.df["Team"] = self.df["player.proTeamId"].map(TEAMS)
+        self.df["Position"] = POSITION_CODES.decode(self.df["player.defaultPositionId"])
+        self.df["Team"] = TEAM_CODES.decode(self.df["player.proTeamId"])
 
+    @timed("draft.filter_df")
     def _filter_df(self):
-        return self.df.loc[
-            (self.df["Position"].isin(self.positions))
-            & (self.df["Team"].isin(self.teams))
-            & (self.df["Drafter"].isin(self.drafters))
-            & (self.df["keeper"].isin(self.keepers))
-            & (self.df["seasonAverage"].between(*self.season_avg))
-            & (self.df["bidAmount"].between(*self.bid_amount))
-        ]
+        mask = self.filter_index.mask(
+            isin={
+                "Position": self.positions,
+                "Team": self.teams,
+                "Drafter": self.drafters,
+                "keeper": self.keepers,
+            },
+            between={
+                "seasonAverage": self.season_avg,
+                "bidAmount": self.bid_amount,
+            },
+        )
+        return self.df.loc[mask]
 
+    @timed("draft.plot_value_scatter", rows=lambda _, page: len(page.plot_df))
     def _plot_value_scatter(self):
-        lr = LinearRegression(fit_intercept=False)
-        lr.fit(self.df[["bidAmount"]], self.df[["seasonAverage"]])
-        reg_x = np.linspace(-5, self.df["bidAmount"].max() + 5).reshape(-1, 1)
-        reg_y = lr.predict(reg_x)
-        plot_df = self._filter_df()
-        reg_df = pd.DataFrame({"x": reg_x.reshape(-1), "y": reg_y.reshape(-1)})
-        fig1 = px.scatter(
-            plot_df,
-            x="bidAmount",
-            y="seasonAverage",
-            hover_data=["player.fullName", "Drafter"],
-            color="keeper",
-            color_discrete_map={True: "red", False: "blue"},
-        )
-        fig2 = px.line(reg_df, x="x", y="y")
-        fig2.update_traces(
-            line=dict(color="black", dash="dash"), hoverinfo="skip", hovertemplate=None
+        reg_x, reg_y = fit_value_line(
+            self.df["bidAmount"].to_numpy(dtype=float),
+            self.df["seasonAverage"].to_numpy(dtype=float),
         )
-        fig = go.Figure(data=fig2.data + fig1.data)
-        fig.update_xaxes(
-            dict(
-                range=[
-                    self.df["bidAmount"].min() - 2,
-                    self.df["bidAmount"].max() + 2,
-                ],
-                zeroline=True,
-                zerolinewidth=1,
-                zerolinecolor="black",
-            )
+        base_fig = value_scatter_base(
+            reg_x,
+            reg_y,
+            x_range=(self.df["bidAmount"].min() - 2, self.df["bidAmount"].max() + 2),
+            y_range=(
+                self.df["seasonAverage"].min() - 2,
+                self.df["seasonAverage"].max() + 2,
+            ),
         )
-        fig.update_yaxes(
-            dict(
-                range=[
-                    self.df["seasonAverage"].min() - 2,
-                    self.df["seasonAverage"].max() + 2,
-                ],
-                zeroline=True,
-                zerolinewidth=1,
-                zerolinecolor="black",
+        fig = go.Figure(base_fig)
+        points = sample_points(self.plot_df)
+        trace = scatter_type(len(points))
+        for keeper, color in KEEPER_COLORS.items():
+            df = points[points["keeper"] == keeper]
+            fig.add_trace(
+                trace(
+                    x=df["bidAmount"],
+                    y=df["seasonAverage"],
+                    mode="markers",
+                    name=str(keeper),
+                    marker=dict(color=color, size=8, line=dict(width=1, color="black")),
+                    customdata=df[["player.fullName", "Drafter"]],
+                    hovertemplate=(
+                        "bidAmount=%{x}<br>seasonAverage=%{y}<br>"
+                        "player.fullName=%{customdata[0]}<br>"
+                        "Drafter=%{customdata[1]}<extra></extra>"
+                    ),
+                )
             )
-        )
-        fig.update_traces(marker=dict(size=8, line=dict(width=1, color="black")))
-        fig.update_layout(
-            title_text="Season Averages vs. Auction Amount",
-            title_x=0.5,
-            xaxis_title="Bid Amount",
-            yaxis_title="Season Scoring Average",
-            height=600,
-        )
         st.plotly_chart(fig, use_container_width=True)
+        if len(points) < len(self.plot_df):
+            st.caption(f"Showing a sample of {len(points)} of {len(self.plot_df)} players")
         # TODO: why is the legend behaving this way?
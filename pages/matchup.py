@@ -1,34 +1,63 @@
-from typing import List, Optional
+from typing import Any, Dict, Optional
 
 import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import polars as pl
 from plotly.subplots import make_subplots
 import streamlit as st
 
-from helpers import json_from_espn_api
+from charts import BoxStats, box_figure, box_stats
+from compact import CodeLookup, compact
+from helpers import (
+    lineup_efficiency,
+    matchup_facts,
+    page_state,
+    schedule_luck,
+    season_tables,
+)
+from matchups import owner_totals, rivalry, select_games, streaks, win_matrix
+from metrics import timed
+from page_registry import TABLE_COLUMNS
 from pages.page import Page
 
+# weekly game columns the plots use; team ids and name parts are dropped
+MATCHUP_COLUMNS = [
+    "Week",
+    "Type",
+    "HomeTeam",
+    "HomePoints",
+    "HomeMargin",
+    "AwayTeam",
+    "AwayPoints",
+    "AwayMargin",
+]
+
 
 class MatchupPage(Page):
+    table_columns = TABLE_COLUMNS["Matchups"]
+
     def __init__(self):
         super().__init__()
 
-        self.matchup_json: Optional[List[dict]] = None
-        self.team_json: Optional[List[dict]] = None
+        self.tables: Optional[Dict[str, pl.DataFrame]] = None
         self.matchup_df: Optional[pd.DataFrame] = None
         self.long_matchup_df: Optional[pd.DataFrame] = None
+        self.facts: Optional[pl.DataFrame] = None
+        self.luck_df: Optional[pl.DataFrame] = None
+        self.lineups_df: Optional[pl.DataFrame] = None
 
     def run(self):
         st.title("Matchups")
         season = st.selectbox(
             label="Season:", options=self.seasons, index=len(self.seasons) - 1
         )
-        self.matchup_json = json_from_espn_api(view="mMatchup", seasonId=season)
-        self.team_json = json_from_espn_api(view="mTeam", seasonId=season)
-        self.build_matchup_df()
-        self.build_long_matchup_df()
+        self.state = page_state(
+            "matchup", season, self.table_columns, lambda: self.build_state(season)
+        )
+        self.matchup_df = self.state["matchup_df"]
+        self.long_matchup_df = self.state["long_matchup_df"]
         st.header("League Trends")
         stat1 = st.radio("Statistic:", ["Points", "Margin"])
         self.plot_league_boxplot(stat=stat1)
@@ -55,51 +84,126 @@ class MatchupPage(Page):
             """
         )
         self.plot_luck_scatter(team=team)
+        st.markdown(
+            """
+            #### Schedule Luck
 
+            * Each team's weekly scores are replayed against a million random schedules.
+            * Bars span the 5th to 95th percentile of simulated wins; the box covers the middle half.
+            * Expected wins come from playing every team every week (all-play record).
+            """
+        )
+        self.luck_df = schedule_luck(season, self.playoff_week)
+        self.plot_schedule_luck(season=season)
+        st.markdown(
+            """
+            #### Lineup Efficiency
+
+            * Each week's optimal lineup starts the highest scorers on the roster that fit the league's starting slots.
+            * Bars show the points each team left on its bench over the season; efficiency is actual over optimal points.
+            """
+        )
+        self.lineups_df = lineup_efficiency(self.seasons)
+        if self.lineups_df is None:
+            st.caption("No boxscores loaded yet; run `python lineups.py` to ingest them.")
+        else:
+            self.plot_bench_points(season=season)
+        st.header("All-Time")
+        self.facts = matchup_facts(tuple(self.seasons), self.playoff_week)
+        since = st.select_slider(
+            "Seasons since:", options=self.seasons, value=self.min_season
+        )
+        game_type = st.radio("Games:", ["All", "Regular", "Playoff"], horizontal=True)
+        facts = select_games(
+            self.facts,
+            since=since,
+            game_type=None if game_type == "All" else game_type,
+        )
+        st.dataframe(
+            owner_totals(facts).join(streaks(facts), on=["ownerId", "owner"]),
+            use_container_width=True,
+        )
+        self.plot_head_to_head(facts)
+        owners = sorted(facts["owner"].unique().to_list())
+        owner_col, opponent_col = st.columns(2)
+        owner = owner_col.selectbox("Owner:", options=owners)
+        opponent = opponent_col.selectbox(
+            "Opponent:", options=[x for x in owners if x != owner]
+        )
+        games = rivalry(facts, owner, opponent)
+        st.dataframe(
+            games.select(
+                "season",
+                "week",
+                "type",
+                "team",
+                "pointsFor",
+                "pointsAgainst",
+                "opponentTeam",
+            ),
+            use_container_width=True,
+        )
+
+    def build_state(self, season: int) -> Dict[str, Any]:
+        """Season artifacts shared by every rerun; see helpers.page_state"""
+        self.tables = season_tables(season, columns=self.table_columns)
+        self.build_matchup_df()
+        self.build_long_matchup_df()
+        return {
+            "matchup_df": self.matchup_df,
+            "long_matchup_df": self.long_matchup_df,
+            "box_stats": self.build_box_stats(),
+        }
+
+    @timed("matchup.build_box_stats")
+    def build_box_stats(self) -> Dict[str, BoxStats]:
+        """Box plots ship these summaries instead of every game"""
+        return {
+            stat: box_stats(self.long_matchup_df, x="Team", y=stat, color="Type")
+            for stat in ["Points", "Margin"]
+        }
+
+    @timed("matchup.build_matchup_df", rows=lambda _, page: len(page.matchup_df))
     def build_matchup_df(self) -> None:
-        matchup_data = [
-            [
-                game.get("matchupPeriodId"),
-                game.get("home").get("teamId") if "home" in game else None,
-                game.get("home").get("totalPoints") if "home" in game else None,
-                game.get("away").get("teamId") if "away" in game else None,
-                game.get("away").get("totalPoints") if "away" in game else None,
-            ]
-            for game in self.matchup_json[0]["schedule"]
-        ]
-        matchup_df = pd.DataFrame(
-            data=matchup_data,
-            columns=["Week", "HomeTeamId", "HomePoints", "AwayTeamId", "AwayPoints"],
+        matchup_df = (
+            self.tables["schedule"]
+            .rename(
+                {
+                    "matchupPeriodId": "Week",
+                    "home.teamId": "HomeTeamId",
+                    "home.totalPoints": "HomePoints",
+                    "away.teamId": "AwayTeamId",
+                    "away.totalPoints": "AwayPoints",
+                }
+            )
+            .to_pandas()
         )
         matchup_df["Type"] = np.where(
             matchup_df["Week"] >= self.playoff_week, "Playoff", "Regular"
         )
-        teams_data = [
-            [
-                team.get("id"),  # integer id
-                team.get("location"),  # first part of nickname
-                team.get("nickname"),  # second part of nickname
-            ]
-            for team in self.team_json[0].get("teams")
-        ]
-        teams_df = pd.DataFrame(
-            data=teams_data, columns=["TeamId", "Location", "Nickname"]
-        )
-        df = matchup_df.merge(
-            right=teams_df, left_on="HomeTeamId", right_on="TeamId", how="left"
-        ).merge(
-            right=teams_df,
-            left_on="AwayTeamId",
-            right_on="TeamId",
-            how="left",
-            suffixes=("Home", "Away"),
-        )
-        df["HomeTeam"] = df["LocationHome"] + " " + df["NicknameHome"]
-        df["AwayTeam"] = df["LocationAway"] + " " + df["NicknameAway"]
+        teams_df = self.tables["teams"].to_pandas()
+        # home and away names decode to one categorical dtype, so they compare
+        team_names = CodeLookup(
+            dict(
+                zip(
+                    teams_df["id"],
+                    teams_df["location"] + " " + teams_df["nickname"],
+                )
+            )
+        )
+        df = matchup_df
+        df["HomeTeam"] = team_names.decode(df["HomeTeamId"])
+        df["AwayTeam"] = team_names.decode(df["AwayTeamId"])
         df["HomeMargin"] = df["HomePoints"] - df["AwayPoints"]
         df["AwayMargin"] = -1 * df["HomeMargin"]
-        self.matchup_df = df[df["HomeMargin"].notna()]
+        self.matchup_df = compact(
+            df[df["HomeMargin"].notna()], columns=MATCHUP_COLUMNS, categorical=["Type"]
+        )
 
+    @timed(
+        "matchup.build_long_matchup_df",
+        rows=lambda _, page: len(page.long_matchup_df),
+    )
     def build_long_matchup_df(self) -> None:
         df_list = []
         for loc in ["Home", "Away"]:
@@ -110,20 +214,123 @@ class MatchupPage(Page):
             )
             df_list.append(df)
         df = pd.concat(df_list, axis=0, ignore_index=True)
-        avg_df = df.groupby("Week", as_index=False).mean()
+        avg_df = df.groupby("Week", as_index=False)[["Margin", "Points"]].mean()
         avg_df["Team"] = "Average"
         avg_df["Type"] = np.where(
             avg_df["Week"] >= self.playoff_week, "Playoff", "Regular"
         )
         df = pd.concat([df, avg_df], axis=0, ignore_index=True)
-        self.long_matchup_df = df
+        self.long_matchup_df = compact(df, categorical=["Team", "Type"])
 
+    @timed("matchup.plot_schedule_luck")
+    def plot_schedule_luck(self, season: int) -> None:
+        df = (
+            self.luck_df.filter(pl.col("season") == season)
+            .sort("expectedWins")
+            .to_pandas()
+        )
+        fig = go.Figure()
+        fig.add_trace(
+            go.Box(
+                x=df["owner"],
+                lowerfence=df["p5"],
+                q1=df["p25"],
+                median=df["p50"],
+                q3=df["p75"],
+                upperfence=df["p95"],
+                name="Simulated Wins",
+                marker_color="lightslategrey",
+            )
+        )
+        fig.add_trace(
+            go.Scatter(
+                x=df["owner"],
+                y=df["expectedWins"],
+                mode="markers",
+                name="Expected Wins",
+                marker=dict(symbol="diamond", size=12, color="black"),
+            )
+        )
+        fig.add_trace(
+            go.Scatter(
+                x=df["owner"],
+                y=df["wins"],
+                mode="markers",
+                name="Actual Wins",
+                marker=dict(size=12, color="crimson"),
+                customdata=df["winsAboveExpected"],
+                hovertemplate="%{y} wins (%{customdata:+.2f} vs. expected)",
+            )
+        )
+        fig.update_layout(title_text="Wins vs. Random Schedules", title_x=0.5)
+        st.plotly_chart(fig, use_container_width=True)
+
+    @timed("matchup.plot_bench_points")
+    def plot_bench_points(self, season: int) -> None:
+        weeks = self.lineups_df.filter(pl.col("season") == season)
+        if weeks.is_empty():
+            st.caption(f"No boxscores loaded for {season}.")
+            return
+        df = (
+            weeks.group_by("team")
+            .agg(pl.col("benchPoints", "actualPoints", "optimalPoints").sum())
+            .with_columns(efficiency=pl.col("actualPoints") / pl.col("optimalPoints"))
+            .sort("benchPoints")
+            .to_pandas()
+        )
+        fig = go.Figure(
+            go.Bar(
+                x=df["team"],
+                y=df["benchPoints"],
+                customdata=df["efficiency"],
+                hovertemplate=(
+                    "%{y:.1f} points left on the bench<br>"
+                    "%{customdata:.1%} lineup efficiency<extra></extra>"
+                ),
+                marker_color="lightslategrey",
+            )
+        )
+        fig.update_layout(title_text="Points Left on the Bench", title_x=0.5)
+        st.plotly_chart(fig, use_container_width=True)
+        st.caption("Costliest lineups of the season")
+        st.dataframe(
+            weeks.sort("benchPoints", descending=True)
+            .head(10)
+            .select(
+                "week",
+                "team",
+                pl.col("actualPoints", "optimalPoints", "benchPoints")
+                .cast(pl.Float64)
+                .round(2),
+            ),
+            use_container_width=True,
+        )
+
+    @timed("matchup.plot_head_to_head")
+    def plot_head_to_head(self, facts: pl.DataFrame) -> None:
+        matrix = win_matrix(facts, value="winPct")
+        fig = px.imshow(
+            matrix.drop("owner").to_numpy(),
+            x=matrix.columns[1:],
+            y=matrix["owner"].to_list(),
+            zmin=0,
+            zmax=1,
+            color_continuous_scale="RdBu",
+            text_auto=".2f",
+            aspect="auto",
+        )
+        fig.update_layout(title_text="Head-to-Head Win Percentage", title_x=0.5)
+        fig.update_xaxes(title="Opponent")
+        fig.update_yaxes(title="Owner")
+        st.plotly_chart(fig, use_container_width=True)
+
+    @timed("matchup.plot_league_boxplot")
     def plot_league_boxplot(self, stat) -> None:
-        fig = px.box(self.long_matchup_df, x="Team", y=stat, color="Type")
+        fig = box_figure(self.state["box_stats"][stat], x="Team", y=stat, color="Type")
         fig.update_layout(title_text=f"Scoring {stat} Quantiles", title_x=0.5)
-        fig.update_xaxes(categoryorder="total ascending")
         st.plotly_chart(fig, use_container_width=True)
 
+    @timed("matchup.plot_team_lineplot")
     def plot_team_lineplot(self, teams, stat) -> None:
         df = self.long_matchup_df[self.long_matchup_df["Team"].isin(teams)].sort_values(
             "Week"
@@ -137,9 +344,10 @@ class MatchupPage(Page):
         fig.update_yaxes(rangemode="tozero")
         st.plotly_chart(fig, use_container_width=True)
 
+    @timed("matchup.plot_team_cumsum")
     def plot_team_cumsum(self, teams, stat):
         df = self.long_matchup_df[self.long_matchup_df["Team"].isin(teams)].sort_values(['Week']).reset_index(drop=True)
-        df[f'Running{stat}'] = df.groupby('Team')[stat].cumsum(axis=0)
+        df[f'Running{stat}'] = df.groupby('Team', observed=True)[stat].cumsum()
         fig = make_subplots(rows=2, cols=1)
         fig.add_trace(
             go.Scatter(x=df['Week'], y=df[stat], mode='lines+markers'), row=1, col=1
@@ -154,6 +362,7 @@ class MatchupPage(Page):
         )
         st.plotly_chart(fig, use_container_width=True)
 
+    @timed("matchup.plot_team_barplot")
     def plot_team_barplot(self, teams, stat) -> None:
         df = (
             self.long_matchup_df[self.long_matchup_df["Team"].isin(teams)]
@@ -165,11 +374,12 @@ class MatchupPage(Page):
         fig.update_layout(xaxis_title=None)
         st.plotly_chart(fig, use_container_width=True)
 
+    @timed("matchup.plot_luck_scatter")
     def plot_luck_scatter(self, team) -> None:
         avg_df = (
             self.matchup_df[["Week", "HomePoints", "AwayPoints"]]
             .melt(id_vars=["Week"], value_name="Points")
-            .groupby("Week", as_index=False)
+            .groupby("Week", as_index=False)["Points"]
             .mean()
         )
         df = self.matchup_df[
@@ -177,9 +387,15 @@ class MatchupPage(Page):
             | (self.matchup_df["AwayTeam"] == team)
         ]
         idx = df["AwayTeam"] == team  # swap columns to make Home for the team of choice
-        df.loc[idx, ["HomeTeam", "HomePoints", "AwayTeam", "AwayPoints"]] = df.loc[
-            idx, ["AwayTeam", "AwayPoints", "HomeTeam", "HomePoints"]
-        ].values
+        swap = {
+            "HomeTeam": "AwayTeam",
+            "HomePoints": "AwayPoints",
+            "AwayTeam": "HomeTeam",
+            "AwayPoints": "HomePoints",
+        }
+        df = df.assign(
+            **{col: np.where(idx, df[other], df[col]) for col, other in swap.items()}
+        )
         df = df.merge(right=avg_df, on="Week")
         df["PointsFor"] = df["HomePoints"] - df["Points"]
         df["PointsAgainst"] = df["AwayPoints"] - df["Points"]
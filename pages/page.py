@@ -1,4 +1,6 @@
 from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Dict, Mapping
 
 
 class Page:
@@ -11,6 +13,18 @@ class Page:
         ]
         self.current_year = datetime.today().year
         self.playoff_week = 14
+        # artifacts from helpers.page_state, shared with other sessions
+        self.state: Mapping[str, Any] = MappingProxyType({})
 
     def run(self):
         raise NotImplementedError
+
+    def frame_bytes(self) -> Dict[str, int]:
+        """Deep bytes of the frames this page holds, own and shared page state"""
+        from compact import frame_bytes
+
+        shared = list(self.state.values())
+        return {
+            "session": frame_bytes(vars(self).values(), exclude=shared),
+            "shared": frame_bytes(shared),
+        }
@@ -0,0 +1,67 @@
+import polars as pl
+
+# statSourceId
+ACTUAL = 0
+PROJECTED = 1
+
+# statSplitTypeId
+SEASON = 0
+WEEKLY = 1
+
+
+def season_stats(stats: pl.DataFrame, season: int) -> pl.DataFrame:
+    """
+    Collapse the long stats table (see decoders.STAT_SCHEMA) into one row per
+    player with actual, projected and weekly aggregates for a season
+    """
+    stats = stats.filter(pl.col("seasonId") == season)
+    totals = (
+        stats.filter(pl.col("statSplitTypeId") == SEASON)
+        .unique(["playerId", "statSourceId"], keep="last", maintain_order=True)
+        .pivot(
+            on="statSourceId",
+            index="playerId",
+            values=["appliedTotal", "appliedAverage"],
+        )
+    )
+    totals = totals.rename(
+        {
+            name: new_name
+            for name, new_name in {
+                f"appliedTotal_{ACTUAL}": "seasonTotal",
+                f"appliedAverage_{ACTUAL}": "seasonAverage",
+                f"appliedTotal_{PROJECTED}": "projectedTotal",
+                f"appliedAverage_{PROJECTED}": "projectedAverage",
+            }.items()
+            if name in totals.columns
+        }
+    )
+    for name in ["seasonTotal", "seasonAverage", "projectedTotal", "projectedAverage"]:
+        if name not in totals.columns:
+            totals = totals.with_columns(pl.lit(None, dtype=pl.Float64).alias(name))
+    weekly = (
+        weekly_points(stats)
+        .group_by("playerId")
+        .agg(
+            pl.len().alias("weeksPlayed"),
+            pl.col("points").max().alias("weeklyMax"),
+            pl.col("points").std().alias("weeklyStd"),
+        )
+    )
+    return totals.join(weekly, on="playerId", how="left")
+
+
+def weekly_points(stats: pl.DataFrame) -> pl.DataFrame:
+    """Actual fantasy points per (player, season, scoring period)"""
+    return (
+        stats.filter(
+            (pl.col("statSplitTypeId") == WEEKLY) & (pl.col("statSourceId") == ACTUAL)
+        )
+        .unique(["playerId", "seasonId", "scoringPeriodId"], keep="last")
+        .select(
+            "playerId",
+            "seasonId",
+            "scoringPeriodId",
+            pl.col("appliedTotal").alias("points"),
+        )
+    )
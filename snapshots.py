@@ -0,0 +1,183 @@
+import argparse
+import os
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+import polars as pl
+
+from warehouse import WAREHOUSE_DIR
+
+# main.py's ranks columns; a player is appended when any VALUE_COLUMNS changes
+SNAPSHOT_SCHEMA = {
+    "player_id": pl.Int64,
+    "player_name": pl.Utf8,
+    "position": pl.Int16,
+    "average_auction_value": pl.Float32,
+    "average_draft_position": pl.Float32,
+    "percent_owned": pl.Float32,
+    "injured": pl.Boolean,
+    "projected_points": pl.Float32,
+}
+VALUE_COLUMNS = [
+    "average_auction_value",
+    "average_draft_position",
+    "percent_owned",
+    "injured",
+    "projected_points",
+]
+
+
+class SnapshotStore:
+    """
+    Append-only history of the preseason ranks. Each append writes only the
+    players whose values changed since the previous one, as a zstd parquet
+    file under season=YYYY/date=YYYY-MM-DD/ with the time it was taken.
+    A player's value at any time is their latest row taken at or before
+    it, and queries are lazy scans pruned by the date partitions.
+    """
+
+    def __init__(self, directory: Path = WAREHOUSE_DIR / "rank_snapshots"):
+        self.directory = Path(directory)
+
+    def latest_path(self, season: int) -> Path:
+        """Every player's most recent values, rewritten on each append"""
+        return self.directory / f"season={season}" / "latest.parquet"
+
+    def append(
+        self, season: int, ranks: pl.DataFrame, taken: Optional[datetime] = None
+    ) -> int:
+        """
+        Store the players in ranks that are new or changed and return how
+        many; columns missing from older ranks files are stored as null
+        """
+        taken = taken or datetime.now()
+        ranks = ranks.select(
+            [
+                pl.col(name).cast(dtype)
+                if name in ranks.columns
+                else pl.lit(None, dtype).alias(name)
+                for name, dtype in SNAPSHOT_SCHEMA.items()
+            ]
+        ).unique("player_id", keep="last")
+        latest = self.latest(season)
+        if latest is None:
+            changed = ranks
+        else:
+            previous = latest.select("player_id", "taken", *VALUE_COLUMNS)
+            changed = (
+                ranks.join(previous, on="player_id", how="left", suffix="_previous")
+                .filter(
+                    pl.col("taken").is_null()
+                    | pl.any_horizontal(
+                        pl.col(name).ne_missing(pl.col(f"{name}_previous"))
+                        for name in VALUE_COLUMNS
+                    )
+                )
+                .select(ranks.columns)
+            )
+        if changed.is_empty():
+            return 0
+        changed = changed.with_columns(taken=pl.lit(taken, pl.Datetime("us")))
+        partition = self.directory / f"season={season}" / f"date={taken.date()}"
+        self._write(changed, partition / f"{taken:%H%M%S%f}.parquet")
+        merged = changed if latest is None else pl.concat([latest, changed])
+        self._write(
+            merged.unique("player_id", keep="last").sort("player_id"),
+            self.latest_path(season),
+        )
+        return len(changed)
+
+    def _write(self, df: pl.DataFrame, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        df.write_parquet(tmp, compression="zstd", statistics=True)
+        os.replace(tmp, path)
+
+    def latest(self, season: int) -> Optional[pl.DataFrame]:
+        path = self.latest_path(season)
+        return pl.read_parquet(path) if path.exists() else None
+
+    def scan(self, season: int) -> pl.LazyFrame:
+        """
+        Lazily scan a season's appended rows. Filters on date skip whole
+        partitions and filters on taken use the row group statistics.
+        """
+        return pl.scan_parquet(
+            self.directory / f"season={season}" / "date=*" / "*.parquet",
+            hive_partitioning=True,
+            hive_schema={"season": pl.Int16, "date": pl.Date},
+        )
+
+    def as_of(self, season: int, when: datetime) -> pl.DataFrame:
+        """Every player's values as they stood at a point in time"""
+        return (
+            self.scan(season)
+            .filter((pl.col("date") <= when.date()) & (pl.col("taken") <= when))
+            .sort("taken")
+            .group_by("player_id")
+            .last()
+            .drop("season", "date")
+            .collect()
+        )
+
+    def history(
+        self, season: int, player_id: int, since: Optional[date] = None
+    ) -> pl.DataFrame:
+        """A player's changes, oldest first"""
+        lf = self.scan(season).filter(pl.col("player_id") == player_id)
+        if since is not None:
+            lf = lf.filter(pl.col("date") >= since)
+        return lf.sort("taken").drop("season", "date").collect()
+
+    def movers(
+        self,
+        season: int,
+        column: str = "average_draft_position",
+        days: float = 7,
+        until: Optional[datetime] = None,
+    ) -> pl.DataFrame:
+        """
+        Change in a value over the days before until (default now), largest
+        first. Players first seen inside the window have no change.
+        """
+        until = until or datetime.now()
+        since = until - timedelta(days=days)
+        taken = pl.col("taken")
+        return (
+            self.scan(season)
+            .filter((pl.col("date") <= until.date()) & (taken <= until))
+            .sort("taken")
+            .group_by("player_id")
+            .agg(
+                pl.col("player_name", "position").last(),
+                pl.col(column).filter(taken <= since).last().alias("before"),
+                pl.col(column).last().alias("after"),
+            )
+            .with_columns(change=pl.col("after") - pl.col("before"))
+            .filter(pl.col("change") != 0)
+            .sort(pl.col("change").abs(), descending=True)
+            .collect()
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Players whose auction value or draft position moved the most "
+        "across the snapshots main.py appended"
+    )
+    parser.add_argument("--season", type=int, required=True)
+    parser.add_argument(
+        "--column", default="average_draft_position", choices=VALUE_COLUMNS
+    )
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    movers = SnapshotStore().movers(args.season, column=args.column, days=args.days)
+    with pl.Config(tbl_rows=args.top):
+        print(movers.head(args.top))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from transport import RECORDINGS_DIR, Recordings, recording_key
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves recorded ESPN payloads with configurable latency and injected errors"""
+
+    recordings: Recordings
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    error_statuses: tuple = (429, 503)
+
+    def do_GET(self):
+        time.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+        if random.random() < self.error_rate:
+            status = random.choice(self.error_statuses)
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        params = parse_qs(urlsplit(self.path).query)
+        key = recording_key(params, self.headers.get("x-fantasy-filter"))
+        data = self.recordings.load(key)
+        if data is None:
+            self.send_error(404, f"no recording for {params}")
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        # recordings are stored gzipped, so serve them as-is like ESPN does
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local stand-in for the ESPN fantasy API serving recorded payloads. "
+        "Point the app at it with ESPN_API_URL=http://localhost:<port>/apis/v3/games/ffl"
+    )
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--recordings", default=RECORDINGS_DIR)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--error-statuses",
+        type=int,
+        nargs="+",
+        default=list(StandInHandler.error_statuses),
+    )
+    args = parser.parse_args()
+
+    StandInHandler.recordings = Recordings(args.recordings)
+    StandInHandler.latency = args.latency_ms / 1000
+    StandInHandler.jitter = args.jitter_ms / 1000
+    StandInHandler.error_rate = args.error_rate
+    StandInHandler.error_statuses = tuple(args.error_statuses)
+    server = ThreadingHTTPServer(("localhost", args.port), StandInHandler)
+    print(f"serving {args.recordings} on http://localhost:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
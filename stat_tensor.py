@@ -0,0 +1,278 @@
+import argparse
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence
+
+import numpy as np
+import polars as pl
+
+from cache import make_cache
+from enumerations import STATS
+from espn_api import FILTERS, ESPNFantasyAPI
+from player_stats import ACTUAL, WEEKLY
+from warehouse import WAREHOUSE_DIR, Warehouse
+
+# tensor axis 2, in stat id order
+STAT_IDS = sorted(STATS)
+STAT_INDEX = {stat_id: i for i, stat_id in enumerate(STAT_IDS)}
+# scoring periods 1..18 (17 before 2021) live at axis 1 index period - 1
+N_PERIODS = 18
+
+# points per unit of each stat; the pts_allow_* stats are 0/1 bracket indicators
+STANDARD = {
+    "pass_yds": 0.04,
+    "pass_td": 4,
+    "pass_2pt": 2,
+    "pass_int": -2,
+    "rush_yds": 0.1,
+    "rush_td": 6,
+    "rush_2pt": 2,
+    "rec_yds": 0.1,
+    "rec_td": 6,
+    "rec_2pt": 2,
+    "fumbles": -2,
+    "fg_50": 5,
+    "fg_40_49": 4,
+    "fg_0_39": 3,
+    "fg_miss_0_39": -1,
+    "xpt": 1,
+    "xpt_miss": -1,
+    "pts_allow_0": 5,
+    "pts_allow_1_6": 4,
+    "pts_allow_7_13": 3,
+    "pts_allow_14_17": 1,
+    "pts_allow_28_34": -1,
+    "pts_allow_35_45": -3,
+    "pts_allow_45_plus": -5,
+    "block_td": 6,
+    "def_int": 2,
+    "fum_recovered": 2,
+    "blocks": 2,
+    "safeties": 2,
+    "sacks": 1,
+    "kick_ret_td": 6,
+    "punt_ret_td": 6,
+    "fum_ret_td": 6,
+    "int_ret_td": 6,
+}
+SCORING = {
+    "standard": STANDARD,
+    "half_ppr": {**STANDARD, "rec": 0.5},
+    "ppr": {**STANDARD, "rec": 1},
+}
+
+
+def weekly_stats_filters(season: int) -> dict:
+    """
+    x-fantasy-filter for a kona_player_info request that also returns every
+    player's stat line of each scoring period; with FILTERS ESPN only sends
+    season totals and projections
+    """
+    return {
+        "players": {
+            **FILTERS["players"],
+            "filterStatsForTopScoringPeriodIds": {
+                "value": N_PERIODS,
+                "additionalValue": [f"00{season}", f"10{season}"],
+            },
+        }
+    }
+
+
+class SeasonTensor(NamedTuple):
+    player_ids: np.ndarray  # sorted int64, axis 0 of stats
+    stats: np.ndarray  # float32 (players x N_PERIODS x len(STAT_IDS))
+
+
+def build_tensor(jsn: dict, season: int) -> SeasonTensor:
+    """
+    Actual weekly stat lines of every player in a kona_player_info season
+    json requested with weekly_stats_filters
+    """
+    lines = []
+    for record in jsn.get("players", []):
+        for entry in (record.get("player") or {}).get("stats") or []:
+            period = entry.get("scoringPeriodId") or 0
+            if (
+                entry.get("statSourceId") == ACTUAL
+                and entry.get("statSplitTypeId") == WEEKLY
+                and entry.get("seasonId") == season
+                and 1 <= period <= N_PERIODS
+            ):
+                lines.append((record["id"], period, entry.get("stats") or {}))
+    player_ids = np.unique(np.array([line[0] for line in lines], dtype=np.int64))
+    stats = np.zeros((len(player_ids), N_PERIODS, len(STAT_IDS)), dtype=np.float32)
+    rows = np.searchsorted(player_ids, [line[0] for line in lines])
+    for row, (_, period, values) in zip(rows, lines):
+        for stat_id, value in values.items():
+            column = STAT_INDEX.get(int(stat_id))
+            if column is not None:
+                stats[row, period - 1, column] = value
+    return SeasonTensor(player_ids, stats)
+
+
+def ingest_tensors(
+    espn: ESPNFantasyAPI, store: "StatTensorStore", seasons: Iterable[int]
+) -> Dict[int, int]:
+    """
+    Fetch the weekly stat lines of every season in one concurrent batch and
+    store each season's tensor. Returns players per season.
+    """
+    seasons = list(seasons)
+    jsons = espn.get_many(
+        [
+            ("kona_player_info", season, {"filters": weekly_stats_filters(season)})
+            for season in seasons
+        ]
+    )
+    players = {}
+    for season, jsn in zip(seasons, jsons):
+        tensor = build_tensor(jsn[0], season)
+        store.write(season, tensor)
+        players[season] = len(tensor.player_ids)
+    return players
+
+
+class StatTensorStore:
+    """One pair of .npy files per season, read back memory-mapped"""
+
+    def __init__(self, directory: Path = WAREHOUSE_DIR / "stat_tensor"):
+        self.directory = Path(directory)
+
+    def path(self, season: int) -> Path:
+        return self.directory / f"season={season}"
+
+    def write(self, season: int, tensor: SeasonTensor) -> None:
+        path = self.path(season)
+        path.mkdir(parents=True, exist_ok=True)
+        for name, array in tensor._asdict().items():
+            tmp = path / f"{name}.{os.getpid()}.tmp.npy"
+            np.save(tmp, array)
+            os.replace(tmp, path / f"{name}.npy")
+
+    def has(self, season: int) -> bool:
+        return (self.path(season) / "stats.npy").exists()
+
+    def seasons(self) -> List[int]:
+        if not self.directory.exists():
+            return []
+        return sorted(
+            int(path.name.split("=")[1])
+            for path in self.directory.glob("season=*")
+            if (path / "stats.npy").exists()
+        )
+
+    def load(self, season: int) -> Optional[SeasonTensor]:
+        """Player index and a read-only memory map of the season's stats"""
+        if not self.has(season):
+            return None
+        path = self.path(season)
+        return SeasonTensor(
+            np.load(path / "player_ids.npy"),
+            np.load(path / "stats.npy", mmap_mode="r"),
+        )
+
+
+def scoring_weights(scorings: Mapping[str, Mapping[str, float]]) -> np.ndarray:
+    """(stats x scorings) matrix of points per stat, from {name: {stat name: points}}"""
+    index = {name: STAT_INDEX[stat_id] for stat_id, name in STATS.items()}
+    weights = np.zeros((len(STAT_IDS), len(scorings)), dtype=np.float32)
+    for j, scoring in enumerate(scorings.values()):
+        for stat, points in scoring.items():
+            weights[index[stat], j] = points
+    return weights
+
+
+def rescore(
+    store: StatTensorStore,
+    scorings: Mapping[str, Mapping[str, float]] = SCORING,
+    seasons: Optional[Sequence[int]] = None,
+) -> pl.DataFrame:
+    """
+    Weekly fantasy points of every player under each scoring, e.g.
+    rescore(store, {"half": {**STANDARD, "rec": 0.5}}), as one
+    (player-weeks x stats) @ (stats x scorings) product over all seasons.
+    Only weeks with any recorded stats are returned.
+    """
+    tensors: Dict[int, SeasonTensor] = {
+        season: store.load(season) for season in seasons or store.seasons()
+    }
+    tensors = {season: t for season, t in tensors.items() if t is not None}
+    if not tensors:
+        return pl.DataFrame(
+            schema={"season": pl.Int16, "playerId": pl.Int64, "scoringPeriodId": pl.Int16}
+            | {name: pl.Float32 for name in scorings}
+        )
+    lines = np.concatenate(
+        [t.stats.reshape(-1, len(STAT_IDS)) for t in tensors.values()]
+    )
+    points = lines @ scoring_weights(scorings)
+    played = lines.any(axis=1)
+    keys = pl.DataFrame(
+        {
+            "season": np.concatenate(
+                [np.full(t.stats.shape[0] * N_PERIODS, s) for s, t in tensors.items()]
+            ).astype(np.int16),
+            "playerId": np.concatenate(
+                [np.repeat(t.player_ids, N_PERIODS) for t in tensors.values()]
+            ),
+            "scoringPeriodId": np.concatenate(
+                [
+                    np.tile(np.arange(1, N_PERIODS + 1), t.stats.shape[0])
+                    for t in tensors.values()
+                ]
+            ).astype(np.int16),
+        }
+    )
+    return keys.with_columns(
+        **{name: points[:, j] for j, name in enumerate(scorings)}
+    ).filter(pl.Series(played))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Season fantasy points and ranks of every player under other "
+        "scoring rules, from the stored stat tensors (load them with ingest.py)"
+    )
+    parser.add_argument("--seasons", type=int, nargs="+")
+    parser.add_argument(
+        "--scorings", nargs="+", choices=list(SCORING), default=list(SCORING)
+    )
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    scorings = {name: SCORING[name] for name in args.scorings}
+    weekly = rescore(StatTensorStore(), scorings, seasons=args.seasons)
+    if weekly.is_empty():
+        parser.error("no stat tensors stored for these seasons, run ingest.py first")
+    totals = (
+        weekly.group_by("season", "playerId")
+        .agg(pl.col(list(scorings)).sum().cast(pl.Float64).round(1))
+        .with_columns(
+            pl.col(name)
+            .rank("ordinal", descending=True)
+            .over("season")
+            .alias(f"{name}Rank")
+            for name in scorings
+        )
+    )
+    warehouse = Warehouse()
+    if warehouse.seasons("players"):
+        names = warehouse.read(
+            "players", columns=["season", "id", "player.fullName"]
+        ).rename({"id": "playerId", "player.fullName": "player"})
+        totals = totals.join(names, on=["season", "playerId"], how="left").select(
+            "season", "playerId", "player", pl.exclude("season", "playerId", "player")
+        )
+    first = f"{args.scorings[0]}Rank"
+    with pl.Config(tbl_rows=-1, tbl_cols=-1):
+        for season in sorted(totals["season"].unique()):
+            print(season)
+            print(
+                totals.filter(pl.col("season") == season, pl.col(first) <= args.top)
+                .sort(first)
+            )
+
+
+if __name__ == "__main__":
+    main()
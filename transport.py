@@ -0,0 +1,128 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Protocol
+
+import requests
+
+RECORDINGS_DIR = Path(os.environ.get("ESPN_RECORDINGS_DIR", "recordings"))
+TRANSPORT_MODE = os.environ.get("ESPN_TRANSPORT", "live")  # live, record or replay
+
+
+class Transport(Protocol):
+    """Anything with requests.Session.get's signature, e.g. a Session itself"""
+
+    def get(
+        self, url: str, headers: dict, params: dict, timeout: float
+    ) -> requests.Response: ...
+
+
+def normalize_params(params: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Query params as sorted string lists, identical for client dicts and parsed urls"""
+    return {
+        key: sorted(str(v) for v in (value if isinstance(value, list) else [value]))
+        for key, value in params.items()
+    }
+
+
+def recording_key(params: Dict[str, Any], fantasy_filter: Optional[str]) -> str:
+    """Hash of the view/params/x-fantasy-filter that identify a payload"""
+    raw = json.dumps(
+        {
+            "params": normalize_params(params),
+            "filter": json.loads(fantasy_filter) if fantasy_filter else None,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def make_response(
+    status_code: int, content: bytes = b"", url: str = ""
+) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response.url = url
+    response.headers["Content-Type"] = "application/json"
+    return response
+
+
+class Recordings:
+    """Directory of gzipped payloads keyed by recording_key, plus a readable index"""
+
+    def __init__(self, directory: Path = RECORDINGS_DIR):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}.json.gz"
+
+    def load(self, key: str) -> Optional[bytes]:
+        """Compressed payload for key, or None if it was never recorded"""
+        path = self.path(key)
+        return path.read_bytes() if path.exists() else None
+
+    def save(self, key: str, params: dict, fantasy_filter: Optional[str], body: bytes):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path(key).write_bytes(gzip.compress(body))
+        with self._lock, open(self.directory / "index.jsonl", "a") as f:
+            f.write(
+                json.dumps(
+                    {
+                        "key": key,
+                        "params": normalize_params(params),
+                        "filter": fantasy_filter,
+                        "bytes": len(body),
+                    }
+                )
+                + "\n"
+            )
+
+
+class RecordingTransport:
+    """Passes requests through to another transport and records successful payloads"""
+
+    def __init__(self, transport: Transport, recordings: Recordings):
+        self.transport = transport
+        self.recordings = recordings
+
+    def get(self, url, headers, params, timeout) -> requests.Response:
+        response = self.transport.get(
+            url=url, headers=headers, params=params, timeout=timeout
+        )
+        if response.ok:
+            fantasy_filter = headers.get("x-fantasy-filter")
+            key = recording_key(params, fantasy_filter)
+            self.recordings.save(key, params, fantasy_filter, response.content)
+        return response
+
+
+class ReplayTransport:
+    """Serves recorded payloads without touching the network; unknown requests get a 404"""
+
+    def __init__(self, recordings: Recordings):
+        self.recordings = recordings
+
+    def get(self, url, headers, params, timeout) -> requests.Response:
+        key = recording_key(params, headers.get("x-fantasy-filter"))
+        data = self.recordings.load(key)
+        if data is None:
+            return make_response(404, url=url)
+        return make_response(200, gzip.decompress(data), url=url)
+
+
+def make_transport(
+    session: requests.Session,
+    mode: str = TRANSPORT_MODE,
+    directory: Path = RECORDINGS_DIR,
+) -> Transport:
+    """Live session, or a recording/replaying wrapper selected by ESPN_TRANSPORT"""
+    if mode == "record":
+        return RecordingTransport(session, Recordings(directory))
+    if mode == "replay":
+        return ReplayTransport(Recordings(directory))
+    return session
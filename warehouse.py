@@ -0,0 +1,123 @@
+import os
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Sequence
+
+import polars as pl
+
+from decoders import (
+    MEMBER_SCHEMA,
+    PICK_SCHEMA,
+    PLAYER_SCHEMA,
+    SCHEDULE_SCHEMA,
+    STAT_SCHEMA,
+    TEAM_SCHEMA,
+    Schema,
+    decode,
+)
+
+WAREHOUSE_DIR = Path(os.environ.get("ESPN_WAREHOUSE_DIR", "warehouse"))
+
+
+class Table(NamedTuple):
+    view: str
+    schema: Schema
+    columns: Optional[List[str]] = None
+
+
+# normalized tables and the view each one is decoded from
+TABLES = {
+    "players": Table(
+        "kona_player_info",
+        PLAYER_SCHEMA,
+        [name for name in PLAYER_SCHEMA.fields if name != "player.stats"],
+    ),
+    "player_stats": Table("kona_player_info", STAT_SCHEMA),
+    "picks": Table("mDraftDetail", PICK_SCHEMA),
+    "teams": Table("mTeam", TEAM_SCHEMA),
+    "members": Table("mTeam", MEMBER_SCHEMA),
+    "schedule": Table("mMatchup", SCHEDULE_SCHEMA),
+}
+
+
+def views_for(tables: Iterable[str]) -> List[str]:
+    """ESPN views needed to build the given tables"""
+    return sorted({TABLES[table].view for table in tables})
+
+
+def decode_table(
+    table: str, jsn: dict, columns: Optional[Sequence[str]] = None
+) -> pl.DataFrame:
+    """Decode one table from a season json"""
+    spec = TABLES[table]
+    return decode(jsn, spec.schema, columns=columns or spec.columns)
+
+
+class Warehouse:
+    """Parquet files of normalized league history, partitioned by table and season"""
+
+    def __init__(self, directory: Path = WAREHOUSE_DIR):
+        self.directory = Path(directory)
+
+    def path(self, table: str, season: int) -> Path:
+        return self.directory / table / f"season={season}" / "data.parquet"
+
+    def write(self, table: str, season: int, df: pl.DataFrame) -> Path:
+        """Atomically replace a table's partition for a season"""
+        path = self.path(table, season)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        df.write_parquet(tmp, compression="zstd", statistics=True)
+        os.replace(tmp, path)
+        return path
+
+    def ingest(self, season: int, jsn: dict, tables: Iterable[str] = TABLES) -> None:
+        """Decode and store every table that can be built from a season json"""
+        for table in tables:
+            self.write(table, season, decode_table(table, jsn))
+
+    def has(self, table: str, season: int) -> bool:
+        return self.path(table, season).exists()
+
+    def seasons(self, table: str) -> List[int]:
+        return sorted(
+            int(path.name.split("=")[1])
+            for path in (self.directory / table).glob("season=*")
+            if (path / "data.parquet").exists()
+        )
+
+    def scan(self, table: str) -> pl.LazyFrame:
+        """
+        Lazily scan every season of a table. Filters on season and column
+        selections are pushed down, so only matching partitions and columns
+        are read.
+        """
+        return pl.scan_parquet(
+            self.directory / table / "season=*" / "data.parquet",
+            hive_partitioning=True,
+            hive_schema={"season": pl.Int16},
+        )
+
+    def read(
+        self,
+        table: str,
+        seasons: Optional[Iterable[int]] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> pl.DataFrame:
+        """Collect a table for some or all seasons, optionally projecting columns"""
+        lf = self.scan(table)
+        if seasons is not None:
+            lf = lf.filter(pl.col("season").is_in(list(seasons)))
+        if columns is not None:
+            lf = lf.select(columns)
+        return lf.collect()
+
+    def read_season(
+        self, table: str, season: int, columns: Optional[Sequence[str]] = None
+    ) -> Optional[pl.DataFrame]:
+        """A table for one season, or None if it has not been ingested"""
+        if not self.has(table, season):
+            return None
+        lf = pl.scan_parquet(self.path(table, season))
+        if columns is not None:
+            lf = lf.select(columns)
+        return lf.collect()
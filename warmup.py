@@ -0,0 +1,158 @@
+import argparse
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from cache import CURRENT_SEASON_TTL, LIVE_TTL, current_season, make_cache, ttl_for
+from espn_api import ESPNAPIError, ESPNFantasyAPI
+from luck import LUCK_TABLE, ingest_luck
+from matchups import FACT_COLUMNS
+from metrics import span
+from page_registry import TABLE_COLUMNS
+from pages.page import Page
+from stat_tensor import StatTensorStore, ingest_tensors
+from warehouse import TABLES, Warehouse, views_for
+
+# live views refreshed for the current season on top of what the pages request
+REFRESH_VIEWS = ["mLiveScoring", "mMatchup"]
+# Monday, Thursday and Sunday
+GAME_DAYS = {0, 3, 6}
+
+logger = logging.getLogger(__name__)
+
+
+def page_requests() -> List[List[str]]:
+    """The combined view requests the pages make for a season not in the warehouse"""
+    columns = list(TABLE_COLUMNS.values()) + [FACT_COLUMNS]
+    return [list(views) for views in sorted({tuple(views_for(c)) for c in columns})]
+
+
+def warm(
+    espn: ESPNFantasyAPI, warehouse: Warehouse, seasons: Sequence[int]
+) -> List[str]:
+    """
+    Ingest completed seasons missing from the warehouse, which the pages
+    read first, along with their simulated schedule luck, and fill the
+    response cache with every request the pages make for seasons that are
+    still changing
+    """
+    done = []
+    live = current_season()
+    tensors = StatTensorStore(warehouse.directory / "stat_tensor")
+    completed = [
+        season
+        for season in seasons
+        if season < live
+        and not (
+            all(warehouse.has(table, season) for table in TABLES)
+            and tensors.has(season)
+            and warehouse.has(LUCK_TABLE, season)
+        )
+    ]
+    if completed:
+        with span("warmup.ingest", seasons=str(len(completed))):
+            jsons = espn.get_many([(views_for(TABLES), s, None) for s in completed])
+        for season, jsn in zip(completed, jsons):
+            warehouse.ingest(season, jsn[0], tables=list(TABLES))
+            done.append(f"{season}: warehouse")
+        with span("warmup.tensors", seasons=str(len(completed))):
+            ingest_tensors(espn, tensors, completed)
+        with span("warmup.luck", seasons=str(len(completed))):
+            ingest_luck(warehouse, completed)
+    current = [season for season in seasons if season >= live]
+    if current:
+        fetches = [(views, s, None) for s in current for views in page_requests()]
+        with span("warmup.cache", seasons=str(len(current))):
+            espn.get_many(fetches)
+        done += [f"{season}: cache" for season in current]
+    return done
+
+
+def refresh(
+    espn: ESPNFantasyAPI, season: int, due: Optional[Dict[Tuple[str, ...], float]] = None
+) -> None:
+    """
+    Resync the current season's page requests and live views; schedules
+    only refetch the matchup periods that are still undecided. With due,
+    the next monotonic time each request needs resyncing, requests are
+    skipped until half their cache TTL has passed since their last sync,
+    so only requests with live views follow the fast game day ticks.
+    """
+    now = time.monotonic()
+    with span("warmup.refresh"):
+        for views in page_requests() + [[view] for view in REFRESH_VIEWS]:
+            request = tuple(views)
+            if due is not None and due.get(request, 0.0) > now:
+                continue
+            espn.sync(view=views, season=season)
+            if due is not None:
+                due[request] = now + (ttl_for(views, season) or CURRENT_SEASON_TTL) / 2
+
+
+def refresh_interval(now: Optional[datetime] = None) -> float:
+    """Refresh before cached entries expire: every half live TTL on game days"""
+    now = now or datetime.now()
+    ttl = LIVE_TTL if now.weekday() in GAME_DAYS else CURRENT_SEASON_TTL
+    return ttl / 2
+
+
+class Refresher(threading.Thread):
+    """Warms every season once, then keeps the current season's cache fresh"""
+
+    def __init__(
+        self, espn: ESPNFantasyAPI, warehouse: Warehouse, seasons: Sequence[int]
+    ):
+        super().__init__(name="espn-refresher", daemon=True)
+        self.espn = espn
+        self.warehouse = warehouse
+        self.seasons = list(seasons)
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            warm(self.espn, self.warehouse, self.seasons)
+        except ESPNAPIError:
+            logger.exception("warm-up failed, pages will fetch on demand")
+        due: Dict[Tuple[str, ...], float] = {}
+        while not self.stopped.wait(refresh_interval()):
+            season = current_season()
+            if season not in self.seasons:
+                continue
+            try:
+                refresh(self.espn, season, due)
+            except ESPNAPIError:
+                # keep serving the cached copy and try again next interval
+                logger.exception("refreshing %s failed", season)
+
+    def stop(self):
+        self.stopped.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pre-populate the warehouse and response cache for every season "
+        "the pages show, optionally refreshing the current season until stopped"
+    )
+    parser.add_argument("--seasons", type=int, nargs="+", default=Page().seasons)
+    parser.add_argument(
+        "--loop",
+        action="store_true",
+        help="Keep refreshing the current season's live views on a schedule",
+    )
+    args = parser.parse_args()
+
+    espn = ESPNFantasyAPI(cache=make_cache())
+    refresher = Refresher(espn, Warehouse(), args.seasons)
+    if args.loop:
+        refresher.run()
+        return
+    for line in warm(espn, refresher.warehouse, args.seasons):
+        print(line)
+
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()